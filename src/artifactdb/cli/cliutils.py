@@ -1,10 +1,27 @@
+import os
 import datetime
 import pathlib
 import importlib
 import enum
+import time
+import hashlib
+import tempfile
+import json
+import copy
+import sqlite3
+import threading
+import queue
+import contextlib
+import fnmatch
 
 import typer
 import yaml
+
+try:
+    # libyaml bindings are much faster, when available
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
 from rich import print, print_json
 from typer import Exit
 
@@ -51,6 +68,20 @@ class SearchProfileError(Exception):
     pass
 
 
+# metadata fields needed to download artifacts, other ones aren't fetched
+ARTIFACT_FIELDS = [
+    "_extra.id",
+    "_extra.file_size",
+    "_extra.md5sum",
+    "file_size",
+    "md5sum",
+]
+# how long (seconds) a resolved latest version of a project is cached
+LATEST_VERSION_TTL = 300
+# connect and read timeouts (seconds) of requests sent directly to the storage
+# (presigned URLs), so a stalled connection fails and can be retried
+STORAGE_TIMEOUT = (10, 300)
+
 ROLE_ACCESS = enum.Enum(
     "read_access",
     {k: k for k in ("owners", "viewers", "authenticated", "public", "none")},
@@ -110,15 +141,168 @@ def build_auth(auth_info):
         return harpocrates.Authenticate(**auth_kwargs)
 
 
+def call_with_retry(func, *args, retries=0, backoff=1.0, no_retry_on=(), **kwargs):
+    """
+    Call `func(*args, **kwargs)`, retrying up to `retries` times when an exception
+    is raised, waiting exponentially longer between each attempt. Exceptions listed
+    in `no_retry_on` (as well as typer's Exit/Abort) are raised immediately.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except (Exit, typer.Abort) + tuple(no_retry_on):
+            raise
+        except Exception as exc:
+            if attempt >= retries:
+                raise
+            attempt += 1
+            delay = min(backoff * 2 ** (attempt - 1), 30)
+            print(
+                f"[orange3]Error, retrying in {delay:.1f}s ({attempt}/{retries})[/orange3]: {exc}"
+            )
+            time.sleep(delay)
+
+
+def prefetch(iterable, maxsize):
+    """
+    Consume `iterable` from a background thread, keeping up to `maxsize` items
+    ahead in a queue, so producing the next items (eg. fetching the next page of
+    results) overlaps with processing the current ones. Exceptions raised by the
+    iterable are raised in the consuming thread. Stopping the iteration early
+    stops the background thread.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except BaseException as exc:
+            put((end, exc))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exc = items.get()
+            if exc is not None:
+                raise exc
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter, spacing calls to wait() so no more than `rate` calls
+    per second go through. A `rate` of None means no limit.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def compute_md5(path, chunk_size=1024 * 1024):
+    md5 = hashlib.md5()
+    with open(path, "rb") as fin:
+        for chunk in iter(lambda: fin.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            break
+        size /= 1024
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+
+
+def atomic_write(path, content, mode="w"):
+    """
+    Write content to a temporary file next to `path`, then rename it, so readers
+    never see a partially written file.
+    """
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, mode) as fout:
+            fout.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# clients are expensive to build (auth, instance discovery, new HTTP session),
+# they're kept for the whole process (which matters within `adb shell`)
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client_cache_key(ctx, **kwargs):
+    """
+    Key identifying a client built from context `ctx` and client `kwargs`. Jobs aren't
+    part of it, they don't affect the client, but any other change in the context
+    (URL, auth, etc...) does, invalidating the cached client.
+    """
+    ctx_def = {k: v for k, v in ctx.items() if k != "jobs"}
+    return (
+        ctx["name"],
+        json.dumps(ctx_def, sort_keys=True, default=str),
+        tuple(sorted((k, repr(v)) for k, v in kwargs.items())),
+    )
+
+
+def clear_client_cache():
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
 def get_contextual_client(name=None, **kwargs):
     ctx = load_current_context() if name is None else load_context(name)
-    auth = build_auth(ctx["auth"])
-    client = get_client(
-        url=ctx["url"],
-        auth=auth,
-        project_prefix=ctx["project_prefix"],
-        **kwargs,
-    )
+    key = get_client_cache_key(ctx, **kwargs)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            auth = build_auth(ctx["auth"])
+            client = get_client(
+                url=ctx["url"],
+                auth=auth,
+                project_prefix=ctx["project_prefix"],
+                **kwargs,
+            )
+            _CLIENTS[key] = client
 
     return client
 
@@ -138,28 +322,22 @@ def load_context(name):
 
 def save_context(name, context, overwrite=False, quiet=False):
     assert name
-    try:
-        load_context(name)
-        if overwrite:
-            if not quiet:
-                print(f"Overwriting existing context {name!r}")
-        else:
-            print(f"Context {name!r} already exists")
-            raise typer.Exit(code=1)
-    except ContextNotFound:
-        pass  # all good, doesn't exist yet
-    # no matter what, try to find one with the same name to remove it
-    contexts = load_contexts()
+    cfg = load_config()
+    contexts = cfg["contexts"]
     idx = None
     for i, ctx in enumerate(contexts):
         if ctx["name"] == name:
             idx = i
             break
     if not idx is None:
+        if overwrite:
+            if not quiet:
+                print(f"Overwriting existing context {name!r}")
+        else:
+            print(f"Context {name!r} already exists")
+            raise typer.Exit(code=1)
         contexts.pop(idx)
     contexts.append(context)
-    cfg = load_config()
-    cfg["contexts"] = contexts
     save_config(cfg)
 
 
@@ -208,15 +386,58 @@ def get_profiles_path():
     return prof_path
 
 
+def get_jobs_db_path():
+    cfg_folder = get_config_directory()
+    jobs_file = "jobs.db"
+    jobs_path = pathlib.Path(cfg_folder, jobs_file)
+    return jobs_path
+
+
+def get_search_cache_path():
+    cfg_folder = get_config_directory()
+    cache_file = "search_cache.db"
+    cache_path = pathlib.Path(cfg_folder, cache_file)
+    return cache_path
+
+
+def get_index_path():
+    cfg_folder = get_config_directory()
+    index_file = "index.db"
+    index_path = pathlib.Path(cfg_folder, index_file)
+    return index_path
+
+
+def get_latest_versions_path():
+    cfg_folder = get_config_directory()
+    versions_file = "latest_versions.json"
+    versions_path = pathlib.Path(cfg_folder, versions_file)
+    return versions_path
+
+
+# parsed config, along with the file stats it was read from, used to
+# avoid parsing the same file again and again while it didn't change
+_CONFIG_CACHE = {"key": None, "config": None}
+
+
+def get_config_cache_key(cfg_path):
+    stat = cfg_path.stat()
+    return (str(cfg_path), stat.st_mtime_ns, stat.st_size)
+
+
 def load_config():
     cfg_path = get_config_path()
     try:
-        cfg = yaml.safe_load(open(cfg_path))
+        key = get_config_cache_key(cfg_path)
+        if _CONFIG_CACHE["key"] != key:
+            with open(cfg_path) as fin:
+                _CONFIG_CACHE["config"] = yaml.load(fin, Loader=YamlLoader)
+            _CONFIG_CACHE["key"] = key
+        # callers are free to modify the config they get
+        cfg = copy.deepcopy(_CONFIG_CACHE["config"])
     except FileNotFoundError:
         print(f"No existing configuration file found at '{cfg_path}', creating one")
         cfg = {"contexts": [], "last-modification": datetime.datetime.now().isoformat()}
-        cfg_path.parent.mkdir(parents=True, exist_ok=True)
-        yaml.dump(cfg, open(cfg_path, "w"))
+        save_config(cfg)
     if not "current-context" in cfg:
         cfg["current-context"] = None
 
@@ -225,7 +446,15 @@ def load_config():
 
 def save_config(cfg):
     cfg_path = get_config_path()
-    yaml.dump(cfg, open(cfg_path, "w"))
+    try:
+        if _CONFIG_CACHE["key"] == get_config_cache_key(cfg_path):
+            if _CONFIG_CACHE["config"] == cfg:
+                return  # nothing changed
+    except FileNotFoundError:
+        pass
+    atomic_write(cfg_path, yaml.dump(cfg, Dumper=YamlDumper))
+    _CONFIG_CACHE["config"] = copy.deepcopy(cfg)
+    _CONFIG_CACHE["key"] = get_config_cache_key(cfg_path)
 
 
 def load_plugins_config():
@@ -279,17 +508,138 @@ def delete_search_profile(name):
     save_search_profiles_file(profiles)
 
 
-def register_job(project_id, version, status):
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    context TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    status TEXT,
+    created_at TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (context, job_id)
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (context, status);
+CREATE INDEX IF NOT EXISTS jobs_created_at_idx ON jobs (context, created_at);
+"""
+
+
+@contextlib.contextmanager
+def jobs_db():
+    """
+    Connection to the local jobs store, committed when leaving the context.
+    Jobs records are stored as JSON, same structure as register_job() creates,
+    along with indexed columns.
+    """
+    db_path = get_jobs_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.executescript(JOBS_SCHEMA)
+        with conn:  # transaction
+            yield conn
+    finally:
+        conn.close()
+
+
+def _upsert_job_records(conn, context_name, records):
+    conn.executemany(
+        "INSERT OR REPLACE INTO jobs (context, job_id, status, created_at, record) "
+        + "VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                context_name,
+                record["job"]["job_id"],
+                record["job"].get("status"),
+                record.get("created_at"),
+                json.dumps(record),
+            )
+            for record in records
+        ],
+    )
+
+
+def migrate_context_jobs(ctx):
+    """
+    Jobs used to be recorded in the context itself, within the config file.
+    Move them to the jobs store (once) and remove them from the config.
+    """
+    if not "jobs" in ctx:
+        return
+    records = []
+    for job in ctx["jobs"] or []:
+        # backward compat, job status only
+        if job and not "job" in job:
+            job = {"job": job, "project_id": None, "version": None}
+        if not job or not job["job"] or not job["job"].get("job_id"):
+            print(f"[orange3]Found invalid job definition, discarded[/orange3]: {job}")
+            continue
+        records.append(job)
+    with jobs_db() as conn:
+        _upsert_job_records(conn, ctx["name"], records)
+    ctx.pop("jobs")
+    save_context(name=ctx["name"], context=ctx, overwrite=True, quiet=True)
+
+
+def load_job_records(context_name, status=None):
+    """
+    Return jobs recorded for a context, sorted by creation date,
+    optionally with given status (case insensitive)
+    """
+    query = "SELECT record FROM jobs WHERE context = ?"
+    params = [context_name]
+    if status:
+        query += " AND upper(status) = ?"
+        params.append(status.upper())
+    query += " ORDER BY created_at"
+    with jobs_db() as conn:
+        return [json.loads(row[0]) for row in conn.execute(query, params)]
+
+
+def load_job_record(context_name, job_id):
+    with jobs_db() as conn:
+        row = conn.execute(
+            "SELECT record FROM jobs WHERE context = ? AND job_id = ?",
+            (context_name, job_id),
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_job_records(context_name, records=(), deleted_job_ids=()):
+    """
+    Insert or update jobs `records`, delete ones in `deleted_job_ids`,
+    all in one transaction
+    """
+    with jobs_db() as conn:
+        _upsert_job_records(conn, context_name, records)
+        conn.executemany(
+            "DELETE FROM jobs WHERE context = ? AND job_id = ?",
+            [(context_name, job_id) for job_id in deleted_job_ids],
+        )
+
+
+def register_jobs(jobs):
+    """
+    Record jobs, a list of (project_id, version, status) tuples, in the
+    current context, all in one write
+    """
     ctx = load_current_context()
-    ctx.setdefault("jobs", []).append(
-        {
-            "project_id": project_id,
-            "version": version,
-            "created_at": datetime.datetime.now().isoformat(),
-            "job": status,
-        }
+    migrate_context_jobs(ctx)
+    created_at = datetime.datetime.now().isoformat()
+    save_job_records(
+        ctx["name"],
+        [
+            {
+                "project_id": project_id,
+                "version": version,
+                "created_at": created_at,
+                "job": status,
+            }
+            for project_id, version, status in jobs
+        ],
     )
-    save_context(name=ctx["name"], context=ctx, overwrite=True)
+
+
+def register_job(project_id, version, status):
+    register_jobs([(project_id, version, status)])
 
 
 def load_plugins(app):
@@ -342,6 +692,100 @@ def load_commands(app, commands_module):
                 print(f"[red]Unable to load command from {cmd_mod_path}: {exc}")
 
 
+def get_field(doc, field):
+    """
+    Return value of dot-notation `field` in `doc`, None if not found
+    """
+    value = doc
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def get_artifact_info(doc):
+    """
+    Extract project ID, version, path, size and md5 checksum of an artifact from its
+    metadata document (size and md5 may be None if the instance doesn't report them)
+    """
+    extra = doc.get("_extra", {})
+    ids = unpack_id(extra["id"])
+    return {
+        "project_id": ids["project_id"],
+        "version": ids["version"],
+        "path": ids["path"],
+        "size": extra.get("file_size", doc.get("file_size")),
+        "md5": doc.get("md5sum", extra.get("md5sum")),
+    }
+
+
+def build_artifacts_query(project_id=None, version=None, query=None):
+    clauses = []
+    if project_id:
+        clauses.append(f'_extra.project_id:"{project_id}"')
+    if version:
+        clauses.append(f'_extra.version:"{version}"')
+    if query:
+        clauses.append(f"({query})")
+    return " AND ".join(clauses)
+
+
+def match_path(path, include=(), exclude=()):
+    """
+    Return True if artifact `path` matches one of `include` glob patterns (if any),
+    and none of the `exclude` ones
+    """
+    if include and not any(fnmatch.fnmatchcase(path, _) for _ in include):
+        return False
+    return not any(fnmatch.fnmatchcase(path, _) for _ in exclude)
+
+
+def list_artifacts(client, project_id, version, query=None, include=(), exclude=()):
+    """
+    Generator yielding information about each artifact found in project_id/version,
+    and/or matching `query` (possibly across projects), as search results are being
+    fetched (pages are consumed lazily). Only artifacts with a path matching
+    `include`/`exclude` glob patterns are returned.
+    """
+    docs = client.search(
+        build_artifacts_query(project_id, version, query), fields=ARTIFACT_FIELDS
+    )
+    for doc in docs:
+        info = get_artifact_info(doc)
+        if match_path(info["path"], include, exclude):
+            yield info
+
+
+def resolve_latest_version(client, project_id, ttl=LATEST_VERSION_TTL):
+    """
+    Return the latest version of a project. Resolved versions are cached locally,
+    per instance, for `ttl` seconds, so repeated calls don't query the API again.
+    """
+    versions_path = get_latest_versions_path()
+    key = f"{client._url}|{project_id}"
+    try:
+        versions = json.load(open(versions_path))
+    except (FileNotFoundError, json.JSONDecodeError):
+        versions = {}
+    now = time.time()
+    entry = versions.get(key)
+    if entry and now - entry["resolved_at"] < ttl:
+        return entry["version"]
+    docs = client.search(
+        f'_extra.project_id:"{project_id}"', fields=["_extra.version"], latest=True
+    )
+    doc = next(iter(docs), None)
+    if doc is None:
+        raise InvalidArgument(f"Unable to find a version for project {project_id!r}")
+    version = doc["_extra"]["version"]
+    # expired entries are dropped while we're at it
+    versions = {k: v for k, v in versions.items() if now - v["resolved_at"] < ttl}
+    versions[key] = {"version": version, "resolved_at": now}
+    atomic_write(versions_path, json.dumps(versions))
+    return version
+
+
 def parse_artifactdb_notation(what, project_id, version, id):
     if what and (project_id or version or id):
         print(
@@ -395,6 +839,11 @@ def load_formatters():
             "artifactdb.cli.formatters.default.YamlFormatter": None,
             "artifactdb.cli.formatters.default.YamlFormatter": "yaml",
             "artifactdb.cli.formatters.default.JsonFormatter": "json",
+            "artifactdb.cli.formatters.ndjson.NdjsonFormatter": "ndjson",
+            "artifactdb.cli.formatters.tabular.CsvFormatter": "csv",
+            "artifactdb.cli.formatters.tabular.TsvFormatter": "tsv",
+            "artifactdb.cli.formatters.tabular.ParquetFormatter": "parquet",
+            "artifactdb.cli.formatters.tabular.ArrowFormatter": "arrow",
         },
     )
 
@@ -0,0 +1,302 @@
+import os
+import re
+import time
+import shutil
+import sqlite3
+import pathlib
+import tempfile
+import contextlib
+
+from typer import Typer, Option
+from rich import print
+
+from ..cliutils import (
+    get_config_directory,
+    load_config,
+    save_config,
+    format_size,
+    InvalidArgument,
+)
+
+
+COMMAND_NAME = "cache"
+app = Typer(help="Manage the local content-addressed download cache")
+
+DEFAULT_CAS_MAX_SIZE = "20GiB"
+# temporary files (downloads in progress) older than that are considered leftovers
+TMP_FILES_TTL = 24 * 3600
+# Linux ioctl used to clone a file (copy-on-write reflink), on filesystems
+# supporting it (btrfs, xfs, ...)
+FICLONE = 0x40049409
+SIZE_UNITS = {
+    "": 1,
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+    "KIB": 1024,
+    "MIB": 1024**2,
+    "GIB": 1024**3,
+    "TIB": 1024**4,
+}
+
+#########
+# UTILS #
+#########
+
+
+def parse_size(size):
+    """
+    Parse a human readable size, eg. "500MB", "20GiB", into bytes
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", str(size))
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise InvalidArgument(f"Invalid size {size!r}, expecting eg. '500MB', '20GiB'")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def load_cas_config():
+    cfg = load_config()
+    cas_cfg = cfg.get("cache") or {}
+    return {
+        "path": cas_cfg.get("path") or str(pathlib.Path(get_config_directory(), "cas")),
+        "max-size": cas_cfg.get("max-size") or DEFAULT_CAS_MAX_SIZE,
+    }
+
+
+def save_cas_config(path=None, max_size=None):
+    cfg = load_config()
+    cas_cfg = cfg.setdefault("cache", {})
+    if path:
+        cas_cfg["path"] = str(pathlib.Path(path).expanduser().resolve())
+    if max_size:
+        parse_size(max_size)  # validate
+        cas_cfg["max-size"] = max_size
+    save_config(cfg)
+
+
+def clone_file(src, dst):
+    """
+    Materialize `src` as `dst`, using a reflink (copy-on-write clone) if the
+    filesystem supports it, falling back to a copy. Either way `dst` doesn't share
+    its content with `src`, so it can be modified safely. Return the method used.
+    """
+    with open(src, "rb") as fin, open(dst, "xb") as fout:
+        try:
+            # Linux only
+            import fcntl
+
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+            return "reflink"
+        except (ImportError, OSError):
+            pass
+        shutil.copyfileobj(fin, fout)
+    return "copy"
+
+
+class CasStore:
+    """
+    Content-addressed store of downloaded artifacts, shared by all projects and
+    versions: files are stored once, by md5 checksum, and materialized where needed
+    with reflinks (or copies). Objects are tracked in a SQLite index, with their last
+    access time, so the least recently used ones are evicted when the store exceeds
+    `max_size` bytes.
+    """
+
+    def __init__(self, path, max_size=None):
+        self.path = pathlib.Path(path).expanduser()
+        self.max_size = max_size
+        (self.path / "objects").mkdir(parents=True, exist_ok=True)
+        (self.path / "tmp").mkdir(exist_ok=True)
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects (md5 TEXT PRIMARY KEY, "
+                + "size INTEGER, created_at REAL, accessed_at REAL, hits INTEGER DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS objects_accessed_at ON objects (accessed_at)"
+            )
+
+    @classmethod
+    def from_config(cls):
+        cas_cfg = load_cas_config()
+        return cls(cas_cfg["path"], parse_size(cas_cfg["max-size"]))
+
+    @contextlib.contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.path / "index.db", timeout=60)
+        try:
+            with conn:  # commit, or rollback on error
+                yield conn
+        finally:
+            conn.close()
+
+    def object_path(self, md5):
+        return self.path / "objects" / md5[:2] / md5
+
+    def tmp_path(self):
+        """
+        Return a temporary file path, within the store (same filesystem)
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.path / "tmp")
+        os.close(fd)
+        return pathlib.Path(tmp_path)
+
+    def materialize(self, md5, tgt):
+        """
+        Materialize object `md5` as `tgt`, if found in the store. Return True on
+        cache hit, False otherwise
+        """
+        src = self.object_path(md5)
+        tgt = pathlib.Path(tgt)
+        tgt.parent.mkdir(parents=True, exist_ok=True)
+        tmp_tgt = tgt.with_name(f".{tgt.name}.cas")
+        tmp_tgt.unlink(missing_ok=True)
+        try:
+            clone_file(src, tmp_tgt)
+        except FileNotFoundError:
+            tmp_tgt.unlink(missing_ok=True)
+            return False
+        os.replace(tmp_tgt, tgt)
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE objects SET accessed_at = ?, hits = hits + 1 WHERE md5 = ?",
+                (time.time(), md5),
+            )
+        return True
+
+    def add(self, md5, src):
+        """
+        Move file `src` (see tmp_path()) into the store, as object `md5`
+        """
+        obj_path = self.object_path(md5)
+        obj_path.parent.mkdir(exist_ok=True)
+        # objects are shared by all projects and versions, make them read-only
+        # so they're not modified by mistake
+        os.chmod(src, 0o444)
+        os.replace(src, obj_path)
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO objects (md5, size, created_at, accessed_at) "
+                + "VALUES (?, ?, ?, ?)",
+                (md5, obj_path.stat().st_size, now, now),
+            )
+
+    def evict(self, max_size=None):
+        """
+        Delete least recently used objects until the store is under `max_size`
+        bytes (defaulting to store's max size). Return number of objects and
+        bytes evicted.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        if max_size is None:
+            return 0, 0
+        num_evicted = size_evicted = 0
+        with self.connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= max_size:
+                return 0, 0
+            rows = conn.execute(
+                "SELECT md5, size FROM objects ORDER BY accessed_at"
+            ).fetchall()
+            for md5, size in rows:
+                if total <= max_size:
+                    break
+                self.object_path(md5).unlink(missing_ok=True)
+                conn.execute("DELETE FROM objects WHERE md5 = ?", (md5,))
+                total -= size
+                num_evicted += 1
+                size_evicted += size
+        return num_evicted, size_evicted
+
+    def stats(self):
+        with self.connect() as conn:
+            num, size, hits, oldest = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0), "
+                + "MIN(accessed_at) FROM objects"
+            ).fetchone()
+        return {
+            "path": str(self.path),
+            "objects": num,
+            "size": size,
+            "max_size": self.max_size,
+            "hits": hits,
+            "least_recently_used": oldest,
+        }
+
+
+############
+# COMMANDS #
+############
+
+
+@app.command()
+def stats():
+    """
+    Show content-addressed cache statistics
+    """
+    store = CasStore.from_config()
+    info = store.stats()
+    print(f":file_cabinet:  Cache folder: {info['path']}")
+    print(
+        f":package: [blue]{info['objects']}[/blue] objects, {format_size(info['size'])} "
+        + f"(max {format_size(info['max_size'])})"
+    )
+    print(f":dart: {info['hits']} cache hits")
+    if info["least_recently_used"]:
+        print(
+            ":hourglass_flowing_sand: Least recently used object accessed on "
+            + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info["least_recently_used"]))
+        )
+
+
+@app.command()
+def prune(
+    max_size: str = Option(
+        None,
+        help="Evict least recently used objects until the cache is under this size, "
+        + "eg. '10GiB' (defaults to the configured maximum size)",
+    ),
+    all: bool = Option(
+        False,
+        help="Evict all objects",
+    ),
+):
+    """
+    Evict least recently used objects from the content-addressed cache
+    """
+    store = CasStore.from_config()
+    if all:
+        max_size = 0
+    elif max_size is not None:
+        max_size = parse_size(max_size)
+    num, size = store.evict(max_size)
+    for tmp_file in (store.path / "tmp").iterdir():
+        # leftovers from interrupted downloads (recent ones may still be in use)
+        if time.time() - tmp_file.stat().st_mtime > TMP_FILES_TTL:
+            tmp_file.unlink(missing_ok=True)
+    print(f":broom: Evicted {num} objects ({format_size(size)})")
+
+
+@app.command()
+def config(
+    path: str = Option(
+        None,
+        help="Folder where cached objects are stored, can be shared between users",
+    ),
+    max_size: str = Option(
+        None,
+        help=f"Maximum size of the cache, eg. '{DEFAULT_CAS_MAX_SIZE}'. Least recently used "
+        + "objects are evicted when exceeded.",
+    ),
+):
+    """
+    Show or set content-addressed cache configuration
+    """
+    if path or max_size:
+        save_cas_config(path, max_size)
+    cas_cfg = load_cas_config()
+    print(f"path: {cas_cfg['path']}")
+    print(f"max-size: {cas_cfg['max-size']}")
@@ -1,16 +1,44 @@
+import os
+import sys
 import enum
+import json
+import shutil
 import pathlib
+import tarfile
+import zipfile
+import tempfile
+import contextlib
+import collections
+from typing import List
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from typer import Typer, Argument, Option, Abort
 from rich import print
 
-from artifactdb.identifiers.aid import pack_id, unpack_id
+try:
+    import zstandard
+except ImportError:
+    # optional, required for `tar.zst` archives only
+    zstandard = None
+
+from artifactdb.identifiers.aid import pack_id
 from artifactdb.utils.misc import get_class_from_classpath
 from artifactdb.client.components.cache.nocache_controller import NoCacheController
 from ..cliutils import (
     get_contextual_client,
+    call_with_retry,
+    compute_md5,
+    atomic_write,
+    get_artifact_info,
+    format_size,
     InvalidArgument,
     parse_artifactdb_notation,
+    resolve_latest_version,
+    list_artifacts,
+    STORAGE_TIMEOUT,
 )
+from .cache import CasStore
 
 
 COMMAND_NAME = "download"
@@ -24,38 +52,501 @@ CACHE_MODES = enum.Enum(
         "artifactdb.client.components.cache.nocache_controller.NoCacheController": None,
         "artifactdb.client.components.cache.nocache_controller.NoCacheController": "no-cache",
         "artifactdb.client.components.cache.bioc_controller.BiocFileCacheController": "biocfilecache",
+        # handled by the CLI itself, not a client's cache controller
+        "artifactdb.cli.commands.cache.CasStore": "cas",
     },
 )
 
+ARCHIVE_FORMATS = enum.Enum(
+    "archive_formats",
+    {
+        "tar": "tar",
+        "tar_zst": "tar.zst",
+        "zip": "zip",
+    },
+)
+
+DEFAULT_CHUNK_SIZE = 8  # MiB
+# artifacts bigger than this are buffered on disk, not in memory, while archived
+ARCHIVE_SPOOL_SIZE = 16 * 1024 * 1024
+# files smaller than this aren't worth splitting into multiple range requests
+MIN_RANGE_PART_SIZE = 64 * 1024 * 1024
+
 #########
 # UTILS #
 #########
 
 
-def download_one_artifact(client, project_id, version, path, dest, overwrite=False):
+def write_response(res, fout, chunk_size):
+    for chunk in res.iter_content(chunk_size=chunk_size):
+        fout.write(chunk)
+
+
+def fetch_range(url, tmp_path, start, end, chunk_size):
+    res = requests.get(
+        url,
+        headers={"Range": f"bytes={start}-{end}"},
+        stream=True,
+        timeout=STORAGE_TIMEOUT,
+    )
+    res.raise_for_status()
+    if res.status_code != 206:
+        raise IOError(f"Range request not supported by server (HTTP {res.status_code})")
+    with open(tmp_path, "r+b") as fout:
+        fout.seek(start)
+        write_response(res, fout, chunk_size)
+
+
+def stream_artifact(client, aid, tgt, chunk_size=DEFAULT_CHUNK_SIZE, connections=1):
+    """
+    Download artifact `aid` to `tgt`, writing `chunk_size` MiB at a time so memory
+    stays flat whatever the file size. Data goes to a temporary file first, renamed
+    once complete. With `connections` > 1, and if the storage supports it, large files
+    are split across several HTTP range requests.
+    """
+    chunk_size = chunk_size * 1024 * 1024
+    tgt.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tgt.parent, prefix=f".{tgt.name}.")
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            # API redirects to the actual storage location (eg. presigned URL)
+            res = client.request(
+                "get", client._url + f"/files/{quote(aid, safe='')}", stream=True
+            )
+            size = int(res.headers.get("Content-Length") or 0)
+            # range requests only sent to the storage the API redirected to, as
+            # they don't carry the client's auth (presigned URLs don't need it)
+            ranged = (
+                connections > 1
+                and res.history
+                and res.headers.get("Accept-Ranges") == "bytes"
+                and size > MIN_RANGE_PART_SIZE
+            )
+            if ranged:
+                res.close()
+                fout.truncate(size)
+            else:
+                write_response(res, fout, chunk_size)
+        if ranged:
+            part_size = max(MIN_RANGE_PART_SIZE, -(-size // connections))
+            with ThreadPoolExecutor(max_workers=connections) as pool:
+                futures = [
+                    pool.submit(
+                        fetch_range,
+                        res.url,
+                        tmp_path,
+                        start,
+                        min(start + part_size, size) - 1,
+                        chunk_size,
+                    )
+                    for start in range(0, size, part_size)
+                ]
+                for future in futures:
+                    future.result()
+        if size and os.path.getsize(tmp_path) != size:
+            raise IOError(
+                f"Incomplete download for {aid!r}, expected {size} bytes, "
+                + f"got {os.path.getsize(tmp_path)}"
+            )
+        os.replace(tmp_path, tgt)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tgt
+
+
+def find_artifact_md5(client, aid):
+    docs = client.search(f'_extra.id:"{aid}"')
+    doc = next(iter(docs), None)
+    return doc and get_artifact_info(doc)["md5"]
+
+
+def fetch_from_store(client, store, aid, md5, tgt, stream_opts):
+    """
+    Materialize artifact `aid` as `tgt` from content-addressed `store`, downloading
+    it first into the store if not there yet (or streaming it directly to `tgt` if
+    there's no checksum to address the content with).
+    """
+    if md5 is None:
+        md5 = find_artifact_md5(client, aid)
+    if not md5:
+        return stream_artifact(client, aid, tgt, **stream_opts)
+    if store.materialize(md5, tgt):
+        return tgt
+    tmp_path = store.tmp_path()
+    try:
+        stream_artifact(client, aid, tmp_path, **stream_opts)
+        if compute_md5(tmp_path) != md5:
+            raise IOError(f"Checksum mismatch for downloaded artifact {aid!r}")
+        store.add(md5, tmp_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    if not store.materialize(md5, tgt):
+        raise IOError(f"Artifact {aid!r} evicted from cache before being used")
+    store.evict()
+    return tgt
+
+
+def download_one_artifact(
+    client,
+    project_id,
+    version,
+    path,
+    dest,
+    overwrite=False,
+    stream_opts=None,
+    store=None,
+    md5=None,
+):
+    """
+    Download one artifact in `dest`. By default, the client (and its cache controller)
+    fetches the data, unless `stream_opts` is given (see stream_artifact() for options).
+    With a content-addressed `store` (see CasStore), the artifact is taken from the store,
+    given its `md5` checksum (fetched if not given), and downloaded there if missing.
+    """
     tgt = pathlib.Path(dest, project_id, version, path)
     if tgt.exists() and not overwrite:
         print(f"'{tgt}' exists, not overwriting")
         raise Abort()
     aid = pack_id(dict(project_id=project_id, version=version, path=path))
+    if store is not None:
+        return fetch_from_store(client, store, aid, md5, tgt, stream_opts or {})
+    if stream_opts is not None:
+        return stream_artifact(client, aid, tgt, **stream_opts)
     outf = client.get_resource_data(aid)
     return outf
 
 
-def download_all_artifacts(client, project_id, version, dest, overwrite=False):
-    docs = client.search(
-        f'_extra.project_id:"{project_id}" AND _extra.version:"{version}"'
+def get_manifest_path(dest, project_id, version):
+    return pathlib.Path(dest, f".{project_id}@{version}.manifest.json")
+
+
+def load_manifest(dest, project_id, version):
+    manifest_path = get_manifest_path(dest, project_id, version)
+    try:
+        manifest = json.load(open(manifest_path))
+    except FileNotFoundError:
+        manifest = {"project_id": project_id, "version": version, "artifacts": {}}
+    except json.JSONDecodeError:
+        print(f"[orange3]Ignoring corrupted manifest '{manifest_path}'[/orange3]")
+        manifest = {"project_id": project_id, "version": version, "artifacts": {}}
+    return manifest
+
+
+def save_manifest(manifest, dest):
+    manifest_path = get_manifest_path(dest, manifest["project_id"], manifest["version"])
+    atomic_write(manifest_path, json.dumps(manifest))
+
+
+def record_manifest_entry(manifest, info, tgt):
+    stat = tgt.stat()
+    manifest["artifacts"][info["path"]] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "md5": info["md5"],
+    }
+
+
+def is_artifact_complete(info, tgt, entry=None):
+    """
+    Return True if local file `tgt` matches artifact's `info` (size and md5). `entry`
+    is the manifest record from a previous run: if the file wasn't modified
+    since, md5 doesn't need to be computed again.
+    """
+    try:
+        stat = tgt.stat()
+    except FileNotFoundError:
+        return False
+    if info["size"] is not None and stat.st_size != info["size"]:
+        return False
+    unchanged = (
+        entry is not None
+        and entry["size"] == stat.st_size
+        and entry["mtime"] == stat.st_mtime
     )
-    at_least_one = False
-    for doc in docs:
-        path = unpack_id(doc["_extra"]["id"])["path"]
-        download_one_artifact(
-            client, project_id, version, path, dest, overwrite=overwrite
+    if info["md5"]:
+        if unchanged and entry["md5"] == info["md5"]:
+            return True
+        return compute_md5(tgt) == info["md5"]
+    # no remote checksum, trust previous run or at least the size
+    return unchanged or info["size"] is not None
+
+
+def download_all_artifacts(
+    client,
+    project_id,
+    version,
+    dest,
+    overwrite=False,
+    jobs=1,
+    retries=0,
+    resume=False,
+    stream_opts=None,
+    store=None,
+    query=None,
+    include=(),
+    exclude=(),
+    verbose=False,
+):
+    """
+    Download all artifacts for project_id/version, and/or matching `query` (possibly
+    across projects), filtered by `include`/`exclude` path glob patterns, using `jobs`
+    concurrent downloads. Search results are streamed to the workers pool, with a bounded
+    number of in-flight downloads, and reported in the search results order.
+    Each download is retried `retries` times before failing the whole run.
+    With `resume`, local files matching remote size/md5 are skipped, and a manifest
+    (per project version) is maintained under `dest` to speed up the next runs.
+    """
+    pending = collections.deque()
+    manifests = {}
+    num_done = 0
+    num_skipped = 0
+
+    def get_manifest(info):
+        key = (info["project_id"], info["version"])
+        if not key in manifests:
+            manifests[key] = load_manifest(dest, *key)
+        return manifests[key]
+
+    def save_manifests():
+        for manifest in manifests.values():
+            save_manifest(manifest, dest)
+
+    def fetch(info, manifest):
+        tgt = pathlib.Path(dest, info["project_id"], info["version"], info["path"])
+        if manifest is not None:
+            entry = manifest["artifacts"].get(info["path"])
+            if is_artifact_complete(info, tgt, entry):
+                return tgt, False
+        call_with_retry(
+            download_one_artifact,
+            client,
+            info["project_id"],
+            info["version"],
+            info["path"],
+            dest,
+            overwrite=overwrite or resume,
+            stream_opts=stream_opts,
+            store=store,
+            md5=info["md5"],
+            retries=retries,
         )
-        at_least_one = True
-    if not at_least_one:
-        print(f"No artifacts found for '{project_id}@{version}'")
+        return tgt, True
+
+    def report(info, manifest, future):
+        nonlocal num_done, num_skipped
+        tgt, downloaded = future.result()  # propagate errors, if any
+        num_done += 1
+        if not downloaded:
+            num_skipped += 1
+        if manifest is not None:
+            record_manifest_entry(manifest, info, tgt)
+            if num_done % 100 == 0:
+                save_manifests()
+        if verbose:
+            icon = ":inbox_tray:" if downloaded else ":fast-forward_button:"
+            name = info["path"]
+            if query:
+                name = f"{info['project_id']}@{info['version']}/{name}"
+            print(f"{icon} [{num_done}] {name}")
+
+    artifacts = list_artifacts(client, project_id, version, query, include, exclude)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            for info in artifacts:
+                # manifests loaded from this thread only
+                manifest = get_manifest(info) if resume else None
+                pending.append((info, manifest, pool.submit(fetch, info, manifest)))
+                # keep the work queue bounded, reporting in order as we go
+                while len(pending) >= 2 * jobs:
+                    report(*pending.popleft())
+            while pending:
+                report(*pending.popleft())
+        except BaseException:
+            for *_, future in pending:
+                future.cancel()
+            raise
+        finally:
+            if num_done:
+                save_manifests()
+
+    if not num_done:
+        scope = f"{project_id}@{version}" if project_id else query
+        print(f"No artifacts found for {scope!r}")
         raise Abort()
+    if verbose:
+        print(
+            f":white_check_mark: Downloaded {num_done - num_skipped} artifact(s)"
+            + (f", {num_skipped} already up-to-date" if resume else "")
+        )
+
+
+def resolve_download_version(client, project_id, version, path, query):
+    """
+    Resolve latest version if needed, and report what is being downloaded
+    """
+    if not project_id:
+        print("query: %s" % query)
+        return version
+    latest = version is None or version.lower() == "latest"
+    if latest:
+        version = resolve_latest_version(client, project_id)
+    print("project_id: %s" % project_id)
+    print("version: %s" % version + (" (latest)" if latest else ""))
+    print("path: %s" % path)
+    return version
+
+
+def fetch_artifact_data(client, aid, size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Fetch artifact `aid` into a temporary file object, kept in memory for small
+    artifacts, spilled to disk above ARCHIVE_SPOOL_SIZE. Return the file object,
+    positioned at the beginning.
+    """
+    data = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE)
+    try:
+        res = client.request(
+            "get", client._url + f"/files/{quote(aid, safe='')}", stream=True
+        )
+        write_response(res, data, chunk_size * 1024 * 1024)
+        if size is not None and data.tell() != size:
+            raise IOError(
+                f"Incomplete download for {aid!r}, expected {size} bytes, got {data.tell()}"
+            )
+        data.seek(0)
+    except BaseException:
+        data.close()
+        raise
+    return data
+
+
+@contextlib.contextmanager
+def archive_output(output):
+    """
+    Open archive `output` file, or use stdout if "-". In that case, whatever is
+    printed goes to stderr instead, to keep the archive intact.
+    """
+    if output != "-":
+        with open(pathlib.Path(output).expanduser(), "wb") as out:
+            yield out
+        return
+    out = sys.stdout.buffer
+    if out.isatty():
+        raise InvalidArgument("Refusing to write an archive to a terminal, use --output")
+    with contextlib.redirect_stdout(sys.stderr):
+        yield out
+    out.flush()
+
+
+@contextlib.contextmanager
+def archive_writer(out, archive_format):
+    """
+    Stream an archive of `archive_format` (see ARCHIVE_FORMATS) to file object `out`
+    (which doesn't need to be seekable). Yield a function `add(name, data, size)`
+    adding a member from file object `data`. Members metadata (dates, permissions)
+    are fixed, so the same content always produces the same archive.
+    """
+    if archive_format == "zip":
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+
+            def add(name, data, size):
+                zinfo = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                zinfo.external_attr = 0o644 << 16
+                zinfo.file_size = size  # so zip64 is used when needed
+                with zout.open(zinfo, "w") as fout:
+                    shutil.copyfileobj(data, fout, 1024 * 1024)
+
+            yield add
+        return
+
+    zstd_out = None
+    if archive_format == "tar.zst":
+        if zstandard is None:
+            raise InvalidArgument("Archive format `tar.zst` requires `zstandard` package")
+        zstd_out = zstandard.ZstdCompressor().stream_writer(out, closefd=False)
+    with tarfile.open(fileobj=zstd_out or out, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+
+        def add(name, data, size):
+            tinfo = tarfile.TarInfo(name)
+            tinfo.size = size
+            tinfo.mode = 0o644
+            tar.addfile(tinfo, data)
+
+        yield add
+    if zstd_out is not None:
+        zstd_out.close()  # flush last zstd frame
+
+
+def archive_artifacts(
+    client,
+    project_id,
+    version,
+    out,
+    archive_format,
+    jobs=1,
+    retries=0,
+    query=None,
+    include=(),
+    exclude=(),
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    verbose=False,
+):
+    """
+    Stream artifacts (selected as in download_all_artifacts()) into an archive written
+    to `out`. Artifacts are fetched using `jobs` concurrent downloads, and added to the
+    archive sorted by project, version and path, with a bounded number of artifacts
+    kept in flight. Members are stored as `{project_id}/{version}/{path}`.
+    """
+    artifacts = sorted(
+        list_artifacts(client, project_id, version, query, include, exclude),
+        key=lambda info: (info["project_id"], info["version"], info["path"]),
+    )
+    if not artifacts:
+        scope = f"{project_id}@{version}" if project_id else query
+        print(f"No artifacts found for {scope!r}")
+        raise Abort()
+    pending = collections.deque()
+    num_done = 0
+    total_size = 0
+
+    def fetch(info):
+        aid = pack_id(
+            dict(project_id=info["project_id"], version=info["version"], path=info["path"])
+        )
+        return call_with_retry(
+            fetch_artifact_data, client, aid, info["size"], chunk_size, retries=retries
+        )
+
+    def write(info, future):
+        nonlocal num_done, total_size
+        with future.result() as data:
+            size = data.seek(0, os.SEEK_END)
+            data.seek(0)
+            name = f"{info['project_id']}/{info['version']}/{info['path']}"
+            add(name, data, size)
+        num_done += 1
+        total_size += size
+        if verbose:
+            print(f":package: [{num_done}/{len(artifacts)}] {name}")
+
+    with archive_writer(out, archive_format) as add:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            try:
+                for info in artifacts:
+                    pending.append((info, pool.submit(fetch, info)))
+                    # bounded number of fetched artifacts waiting to be archived
+                    while len(pending) >= 2 * jobs:
+                        write(*pending.popleft())
+                while pending:
+                    write(*pending.popleft())
+            except BaseException:
+                for _, future in pending:
+                    future.cancel()
+                raise
+    print(
+        f":white_check_mark: Archived {num_done} artifact(s) ({format_size(total_size)})"
+    )
 
 
 def list_cache_modes():
@@ -88,8 +579,8 @@ def download_command(
     ),
     version: str = Option(
         None,
-        help="Requires --project-id. Download specific version of a project, or the latest"
-        + "available if omitted",
+        help="Requires --project-id. Download specific version of a project, or the latest "
+        + "available if omitted (or set to `latest`)",
     ),
     id: str = Option(
         None,
@@ -100,9 +591,37 @@ def download_command(
         ".",
         help="Path to folder containing the files to download, defaulting to current folder.",
     ),
+    archive: ARCHIVE_FORMATS = Option(
+        None,
+        help="Instead of downloading files in a folder, stream them into an archive of given "
+        + "format, written to --output. `tar.zst` requires the `zstandard` package.",
+    ),
+    output: str = Option(
+        "-",
+        "--output",
+        "-o",
+        help="Requires --archive. Path of the archive file, or `-` for stdout (default)",
+    ),
+    query: str = Option(
+        None,
+        help="Download artifacts matching this search query (Lucene syntax), possibly across "
+        + "several projects. Combined with --project-id/--version if given, to select artifacts "
+        + "within a project version. A single argument is then considered as the destination.",
+    ),
+    include: List[str] = Option(
+        None,
+        help="Only download artifacts with a path matching this glob pattern, eg. '*.csv' "
+        + "(can be used multiple times)",
+    ),
+    exclude: List[str] = Option(
+        None,
+        help="Don't download artifacts with a path matching this glob pattern, eg. 'raw/*' "
+        + "(can be used multiple times)",
+    ),
     cache: str = Option(
         None,
-        help="Cache mode used to cache files while downloaded. Default is no cache",
+        help="Cache mode used to cache files while downloaded. Default is no cache. `cas` "
+        + "uses a local content-addressed cache, shared across projects (see `cache` command)",
         autocompletion=list_cache_modes,
     ),
     verbose: bool = Option(
@@ -113,24 +632,102 @@ def download_command(
         False,
         help="If local files exist, don't overwrite with downloaded artifact.",
     ),
+    jobs: int = Option(
+        1,
+        help="Number of artifacts downloaded in parallel, when downloading a whole project version",
+        min=1,
+    ),
+    retries: int = Option(
+        2,
+        help="Number of times a failing artifact download is retried before giving up",
+        min=0,
+    ),
+    resume: bool = Option(
+        False,
+        help="Resume a previous download of a project version: existing local files matching "
+        + "remote size and checksum are skipped, others are (re)downloaded. A manifest file "
+        + "is kept in the destination folder to speed up next runs.",
+    ),
+    stream: bool = Option(
+        False,
+        help="Stream artifacts directly to disk, in fixed-size chunks with bounded memory, "
+        + "instead of going through the client's cache controller. Not compatible with --cache.",
+    ),
+    chunk_size: int = Option(
+        DEFAULT_CHUNK_SIZE,
+        help="Requires --stream (or `cas` cache). Size of the chunks written to disk, in MiB",
+        min=1,
+    ),
+    connections: int = Option(
+        1,
+        help="Requires --stream (or `cas` cache). Number of HTTP range requests used in "
+        + "parallel to download one large file (if supported by the storage)",
+        min=1,
+    ),
 ):
     """
     Download artifacts.
     """
-    project_id, version, path = parse_artifactdb_notation(what, project_id, version, id)
-    if version is None:
-        raise InvalidArgument(
-            "Download a project without a version number is not supported at the moment."
+    path = None
+    if query and what and dest == ".":
+        # with --query, a single argument is the destination folder, the query
+        # can be restricted to a project with --project-id/--version
+        if "@" in what and not pathlib.Path(what).exists():
+            raise InvalidArgument(
+                "With --query, a single argument is the destination folder, "
+                + f"but {what!r} looks like a project version: pass the "
+                + "destination folder too, or use --project-id/--version"
+            )
+        what, dest = None, what
+    if not query or what or project_id or version or id:
+        # otherwise, artifacts selected by the query only, across projects
+        project_id, version, path = parse_artifactdb_notation(
+            what, project_id, version, id
         )
-    if version.lower() == "latest":
-        raise InvalidArgument("`latest` is not supported at the moment")
+        if path and (query or include or exclude):
+            raise InvalidArgument(
+                "Options --query, --include and --exclude can't be used to download one artifact"
+            )
 
-    print("project_id: %s" % project_id)
-    print("version: %s" % version)
-    print("path: %s" % path)
+    if archive:
+        if path or resume or cache or stream:
+            raise InvalidArgument(
+                "Option --archive can't be used to download one artifact, nor with "
+                + "--resume, --cache or --stream"
+            )
+        with archive_output(output) as out:
+            client = get_contextual_client()
+            version = resolve_download_version(client, project_id, version, path, query)
+            archive_artifacts(
+                client,
+                project_id,
+                version,
+                out,
+                archive.value,
+                jobs=jobs,
+                retries=retries,
+                query=query,
+                include=include,
+                exclude=exclude,
+                chunk_size=chunk_size,
+                verbose=verbose,
+            )
+        return
+
+    stream_opts = None
+    if stream:
+        if cache and cache not in ("no-cache", "cas"):
+            raise InvalidArgument("Option --stream can't be used with a cache mode")
+        stream_opts = {"chunk_size": chunk_size, "connections": connections}
 
+    store = None
     cache_class = NoCacheController
-    if cache:
+    if cache == "cas":
+        # artifacts streamed to the content-addressed store, then linked to `dest`
+        store = CasStore.from_config()
+        stream_opts = {"chunk_size": chunk_size, "connections": connections}
+        print(f"cache store: {str(store.path)!r}")
+    elif cache:
         cls = find_cache_class(cache)
         cache_class = get_class_from_classpath(cls)
         print(f"cache controller: {cache_class.__name__!r}")
@@ -139,11 +736,34 @@ def download_command(
         cache_controller=cache_class,
         cache_dir=dest,
     )
+    version = resolve_download_version(client, project_id, version, path, query)
     if path:
-        download_one_artifact(
-            client, project_id, version, path, dest=dest, overwrite=overwrite
+        call_with_retry(
+            download_one_artifact,
+            client,
+            project_id,
+            version,
+            path,
+            dest=dest,
+            overwrite=overwrite,
+            stream_opts=stream_opts,
+            store=store,
+            retries=retries,
         )
     else:
         download_all_artifacts(
-            client, project_id, version, dest=dest, overwrite=overwrite
+            client,
+            project_id,
+            version,
+            dest=dest,
+            overwrite=overwrite,
+            jobs=jobs,
+            retries=retries,
+            resume=resume,
+            stream_opts=stream_opts,
+            store=store,
+            query=query,
+            include=include,
+            exclude=exclude,
+            verbose=verbose,
         )
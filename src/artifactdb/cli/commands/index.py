@@ -0,0 +1,634 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+
+from typer import Typer, Argument, Option, Abort
+from rich import print
+
+from artifactdb.identifiers.aid import unpack_id
+from ..cliutils import (
+    get_contextual_client,
+    load_current_context,
+    get_index_path,
+    format_size,
+    get_field,
+    build_artifacts_query,
+    InvalidArgument,
+)
+
+
+COMMAND_NAME = "index"
+app = Typer(help="Manage the local metadata index, used by `search --offline`")
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY, url TEXT, what TEXT, project_id TEXT, version TEXT,
+    query TEXT, pulled_at REAL, UNIQUE (url, what)
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY, url TEXT, aid TEXT, project_id TEXT, version TEXT,
+    checksum TEXT, doc TEXT, UNIQUE (url, aid)
+);
+CREATE TABLE IF NOT EXISTS members (
+    source INTEGER, doc INTEGER, PRIMARY KEY (source, doc)
+);
+CREATE INDEX IF NOT EXISTS members_doc ON members (doc);
+CREATE TABLE IF NOT EXISTS fields (
+    id INTEGER PRIMARY KEY, doc INTEGER, field TEXT, value TEXT, num REAL
+);
+CREATE INDEX IF NOT EXISTS fields_doc ON fields (doc);
+CREATE INDEX IF NOT EXISTS fields_value ON fields (field, value COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS fields_num ON fields (field, num);
+CREATE VIRTUAL TABLE IF NOT EXISTS fields_fts USING fts5(
+    value, content='fields', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS fields_ai AFTER INSERT ON fields BEGIN
+    INSERT INTO fields_fts (rowid, value) VALUES (new.id, new.value);
+END;
+CREATE TRIGGER IF NOT EXISTS fields_ad AFTER DELETE ON fields BEGIN
+    INSERT INTO fields_fts (fields_fts, rowid, value)
+    VALUES ('delete', old.id, old.value);
+END;
+"""
+
+# query string syntax tokens (subset of Elasticsearch's query_string)
+TOKEN_RE = re.compile(
+    r"""\s*(?:
+    (?P<paren>[()])
+    |(?P<op>&&|\|\|)
+    |(?P<prefix>[+\-!])(?=\S)
+    |(?P<phrase>"(?:\\.|[^"\\])*")
+    |(?P<range>[\[{][^\]}]*[\]}])
+    |(?P<field>(?:\\.|[^\s()"\[\]{}:\\])+):
+    |(?P<term>(?:\\.|[^\s()"\[\]{}\\])+)
+    )""",
+    re.VERBOSE,
+)
+WILDCARD_RE = re.compile(r"(?<!\\)[*?]")
+KEYWORDS = {"AND": "AND", "OR": "OR", "NOT": "NOT", "&&": "AND", "||": "OR"}
+
+#########
+# UTILS #
+#########
+
+
+def unescape(text):
+    return re.sub(r"\\(.)", r"\1", text)
+
+
+def tokenize(query):
+    tokens = []
+    query = query.strip()
+    pos = 0
+    while pos < len(query):
+        match = TOKEN_RE.match(query, pos)
+        if not match:
+            raise InvalidArgument(f"Unable to parse query {query!r} at {query[pos:]!r}")
+        kind, value = match.lastgroup, match.group(match.lastgroup)
+        if kind in ("term", "op") and value in KEYWORDS:
+            kind, value = "op", KEYWORDS[value]
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def build_leaf(field, kind, raw):
+    if kind == "phrase":
+        return ("match", field, unescape(raw[1:-1]))
+    if kind == "range":
+        if not field:
+            raise InvalidArgument(f"A field is required for range {raw!r}")
+        bounds = re.split(r"\s+TO\s+", raw[1:-1].strip())
+        if len(bounds) != 2:
+            raise InvalidArgument(f"Invalid range {raw!r}, expecting eg. '[1 TO 10]'")
+        low, high = [None if b == "*" else unescape(b.strip('"')) for b in bounds]
+        return ("range", field, low, high, raw[0] == "[", raw[-1] == "]")
+    if field == "_exists_":
+        return ("exists", unescape(raw))
+    for op in (">=", "<=", ">", "<"):
+        if field and raw.startswith(op):
+            bound = unescape(raw[len(op):].strip('"'))
+            if op[0] == ">":
+                return ("range", field, bound, None, op == ">=", False)
+            return ("range", field, None, bound, False, op == "<=")
+    if raw == "*":
+        return ("exists", field) if field else ("all",)
+    if WILDCARD_RE.search(raw):
+        return ("wildcard", field, unescape(raw))
+    return ("match", field, unescape(raw))
+
+
+class QueryParser:
+    """
+    Parse a query string (Lucene/Elasticsearch syntax: terms, "phrases", field:value,
+    field:(grouped values), wildcards, ranges, _exists_, AND/OR/NOT, +/-, parentheses)
+    into a tree of tuples. Like Elasticsearch, terms without operators are OR'ed
+    and negated ones (NOT/-/!) must not match.
+    """
+
+    def __init__(self, query):
+        self.tokens = tokenize(query)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def is_negation(self):
+        token = self.peek()
+        return token == ("op", "NOT") or token in (("prefix", "-"), ("prefix", "!"))
+
+    def parse(self):
+        if not self.tokens:
+            return ("all",)
+        node = self.parse_or(None)
+        if self.pos < len(self.tokens):
+            raise InvalidArgument(f"Unexpected {self.peek()[1]!r} in query")
+        return node
+
+    def parse_or(self, field):
+        nodes = []
+        negated = []
+        while self.peek()[0] is not None and self.peek() != ("paren", ")"):
+            if nodes and self.peek() == ("op", "OR"):
+                self.take()
+            node = self.parse_and(field)
+            (negated if node[0] == "not" else nodes).append(node)
+        if not nodes and not negated:
+            raise InvalidArgument("Empty query or group")
+        if negated:
+            positive = nodes[0] if len(nodes) == 1 else ("or", nodes or [("all",)])
+            return ("and", [positive] + negated)
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self, field):
+        nodes = [self.parse_not(field)]
+        while self.peek() == ("op", "AND"):
+            self.take()
+            nodes.append(self.parse_not(field))
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self, field):
+        if self.is_negation():
+            self.take()
+            return ("not", self.parse_not(field))
+        if self.peek() == ("prefix", "+"):
+            self.take()  # required term, already the case when AND'ed
+        return self.parse_primary(field)
+
+    def parse_primary(self, field):
+        kind, value = self.take()
+        if (kind, value) == ("paren", "("):
+            node = self.parse_or(field)
+            if self.take() != ("paren", ")"):
+                raise InvalidArgument("Missing closing parenthesis in query")
+            return node
+        if kind == "field":
+            name = unescape(value)
+            if self.peek() != ("paren", "(") and self.peek()[0] not in (
+                "term",
+                "phrase",
+                "range",
+            ):
+                raise InvalidArgument(f"Missing value for field {name!r} in query")
+            return self.parse_primary(name)
+        if kind in ("term", "phrase", "range"):
+            return build_leaf(field, kind, value)
+        if kind is None:
+            raise InvalidArgument("Unexpected end of query")
+        raise InvalidArgument(f"Unexpected {value!r} in query")
+
+
+def glob_escape(text):
+    return re.sub(r"([\[*?])", r"[\1]", text)
+
+
+def field_clause(field):
+    if field is None:
+        return "", []
+    if WILDCARD_RE.search(field):
+        return " AND f.field GLOB ?", [field]
+    return " AND f.field = ?", [field]
+
+
+def fts_phrase(text):
+    # FTS5 tokenizer only keeps letters and digits, nothing to match otherwise
+    if not re.search(r"[^\W_]", text):
+        return None
+    return '"' + text.replace('"', '""') + '"'
+
+
+def is_number(value):
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def to_sql(node):
+    """
+    Translate a parsed query `node` (see QueryParser) into a SQL condition
+    on docs (aliased `d`), along with its parameters
+    """
+    kind = node[0]
+    if kind == "all":
+        return "1", []
+    if kind in ("and", "or"):
+        parts = [to_sql(child) for child in node[1]]
+        sql = f" {kind.upper()} ".join(f"({part})" for part, _ in parts)
+        return sql, [param for _, params in parts for param in params]
+    if kind == "not":
+        sql, params = to_sql(node[1])
+        return f"NOT ({sql})", params
+    field = node[1]
+    fields_query = "d.id IN (SELECT f.doc FROM fields AS f WHERE {}{})"
+    fts_query = (
+        "d.id IN (SELECT f.doc FROM fields_fts "
+        + "JOIN fields AS f ON f.id = fields_fts.rowid WHERE fields_fts MATCH ?{})"
+    )
+    if kind == "exists":
+        if WILDCARD_RE.search(field):
+            return fields_query.format("f.field GLOB ?", ""), [field]
+        # field is a leaf, or an object with leaves
+        return (
+            fields_query.format("(f.field = ? OR f.field GLOB ?)", ""),
+            [field, glob_escape(field) + ".*"],
+        )
+    clause, params = field_clause(field)
+    if kind == "match":
+        phrase = fts_phrase(node[2])
+        if phrase is None:
+            return (
+                fields_query.format("f.value = ? COLLATE NOCASE", clause),
+                [node[2]] + params,
+            )
+        return fts_query.format(clause), [phrase] + params
+    if kind == "wildcard":
+        text = node[2]
+        prefix = text[:-1]
+        if (
+            text.endswith("*")
+            and not WILDCARD_RE.search(prefix)
+            and re.search(r"[^\W_]$", prefix)
+        ):
+            # prefix query, directly supported by FTS5
+            return fts_query.format(clause), [fts_phrase(prefix) + "*"] + params
+        pattern = "".join(
+            c if WILDCARD_RE.match(c) else glob_escape(c) for c in text.lower()
+        )
+        return fields_query.format("lower(f.value) GLOB ?", clause), [pattern] + params
+    if kind == "range":
+        _, field, low, high, incl_low, incl_high = node
+        numeric = all(bound is None or is_number(bound) for bound in (low, high))
+        conds = ["1"]
+        bound_params = []
+        for bound, op in (
+            (low, ">=" if incl_low else ">"),
+            (high, "<=" if incl_high else "<"),
+        ):
+            if bound is None:
+                continue
+            if numeric:
+                # values stored as strings (eg. versions) are compared as strings
+                conds.append(f"(f.num {op} ? OR (f.num IS NULL AND f.value {op} ?))")
+                bound_params.extend([float(bound), bound])
+            else:
+                conds.append(f"f.value {op} ?")
+                bound_params.append(bound)
+        return fields_query.format(" AND ".join(conds), clause), bound_params + params
+    raise InvalidArgument(f"Unsupported query element {node!r}")
+
+
+def iter_fields(value, name=""):
+    """
+    Yield (field, value, number) for each leaf of document `value`, with dot-notation
+    field names (number being the value itself if numeric, None otherwise). List items
+    are yielded under the same field name.
+    """
+    if isinstance(value, dict):
+        for key, val in value.items():
+            yield from iter_fields(val, f"{name}.{key}" if name else key)
+    elif isinstance(value, list):
+        for val in value:
+            yield from iter_fields(val, name)
+    elif value is not None:
+        if isinstance(value, bool):
+            yield name, str(value).lower(), None
+        elif isinstance(value, (int, float)):
+            yield name, str(value), value
+        else:
+            yield name, str(value), None
+
+
+def select_fields(doc, fields):
+    """
+    Keep only dot-notation `fields` from `doc`, like the API does
+    """
+    selected = {}
+    for field in fields:
+        value = get_field(doc, field)
+        if value is None:
+            continue
+        *parents, leaf = field.split(".")
+        node = selected
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return selected
+
+
+def version_key(version):
+    return (1, int(version), "") if version.isdigit() else (0, 0, version)
+
+
+@contextlib.contextmanager
+def open_index():
+    conn = sqlite3.connect(get_index_path(), timeout=60)
+    try:
+        conn.executescript(INDEX_SCHEMA)
+        with conn:  # commit, or rollback on error
+            yield conn
+    finally:
+        conn.close()
+
+
+def index_doc(conn, url, doc):
+    """
+    Insert or update metadata document `doc`. Return its row ID and
+    "new", "updated", or None if unchanged
+    """
+    aid = doc.get("_extra", {}).get("id")
+    if not aid:
+        return None, None
+    checksum = hashlib.sha1(json.dumps(doc, sort_keys=True).encode()).hexdigest()
+    row = conn.execute(
+        "SELECT id, checksum FROM docs WHERE url = ? AND aid = ?", (url, aid)
+    ).fetchone()
+    if row and row[1] == checksum:
+        return row[0], None
+    if row:
+        doc_id, status = row[0], "updated"
+        conn.execute(
+            "UPDATE docs SET checksum = ?, doc = ? WHERE id = ?",
+            (checksum, json.dumps(doc), doc_id),
+        )
+        conn.execute("DELETE FROM fields WHERE doc = ?", (doc_id,))
+    else:
+        ids = unpack_id(aid)
+        status = "new"
+        doc_id = conn.execute(
+            "INSERT INTO docs (url, aid, project_id, version, checksum, doc) "
+            + "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, aid, ids["project_id"], ids["version"], checksum, json.dumps(doc)),
+        ).lastrowid
+    conn.executemany(
+        "INSERT INTO fields (doc, field, value, num) VALUES (?, ?, ?, ?)",
+        [(doc_id, *leaf) for leaf in iter_fields(doc)],
+    )
+    return doc_id, status
+
+
+def delete_orphan_docs(conn, url):
+    """
+    Delete documents not pulled by any source anymore. Return how many were deleted.
+    """
+    orphans = (
+        "SELECT id FROM docs WHERE url = ? AND id NOT IN (SELECT doc FROM members)"
+    )
+    conn.execute(f"DELETE FROM fields WHERE doc IN ({orphans})", (url,))
+    return conn.execute(f"DELETE FROM docs WHERE id IN ({orphans})", (url,)).rowcount
+
+
+def parse_source(what, is_query=False):
+    """
+    Return project ID, version and search query of a source to pull: `what` is
+    a project, with an optional version (project_id[@version]), or a search query
+    """
+    if is_query or not re.fullmatch(r"[^\s:()\"*?@]+(@[^\s:()\"*?@]+)?", what):
+        return None, None, what
+    project_id, _, version = what.partition("@")
+    version = version or None
+    return project_id, version, build_artifacts_query(project_id, version)
+
+
+def pull_source(conn, client, url, what, is_query=False, full=False):
+    """
+    Index metadata documents from source `what` (see parse_source()). Project versions
+    being immutable, only new versions are pulled for a project already indexed,
+    unless `full` is set. Documents matching a search query are pulled again, but only
+    changed ones are re-indexed. With `full` or a query, documents not found anymore
+    are removed. Return the number of new, updated, unchanged and removed documents.
+    """
+    project_id, version, query = parse_source(what, is_query)
+    row = conn.execute(
+        "SELECT id FROM sources WHERE url = ? AND what = ?", (url, what)
+    ).fetchone()
+    if row:
+        source_id = row[0]
+    else:
+        source_id = conn.execute(
+            "INSERT INTO sources (url, what, project_id, version, query) "
+            + "VALUES (?, ?, ?, ?, ?)",
+            (url, what, project_id, version, query),
+        ).lastrowid
+    counts = {"new": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    if project_id and not full:
+        known = [
+            v
+            for v, in conn.execute(
+                "SELECT DISTINCT d.version FROM docs AS d "
+                + "JOIN members AS m ON m.doc = d.id WHERE m.source = ?",
+                (source_id,),
+            )
+        ]
+        if version and known:
+            return counts
+        if known:
+            excluded = " OR ".join(f'_extra.version:"{v}"' for v in known)
+            query += f" AND NOT ({excluded})"
+
+    seen = set()
+    for doc in client.search(query):
+        doc_id, status = index_doc(conn, url, doc)
+        if doc_id is None:
+            continue
+        seen.add(doc_id)
+        counts[status or "unchanged"] += 1
+        conn.execute(
+            "INSERT OR IGNORE INTO members VALUES (?, ?)", (source_id, doc_id)
+        )
+    if full or not project_id:
+        members = [
+            doc
+            for doc, in conn.execute(
+                "SELECT doc FROM members WHERE source = ?", (source_id,)
+            )
+        ]
+        gone = [(source_id, doc_id) for doc_id in members if doc_id not in seen]
+        conn.executemany("DELETE FROM members WHERE source = ? AND doc = ?", gone)
+    counts["removed"] = delete_orphan_docs(conn, url)
+    conn.execute(
+        "UPDATE sources SET pulled_at = ? WHERE id = ?", (time.time(), source_id)
+    )
+    return counts
+
+
+def search_index(url, query, fields=None, latest=False):
+    """
+    Search metadata documents indexed locally for instance `url`, using the query
+    string syntax. Return a generator of documents, restricted to `fields` if any,
+    and to latest versions (among the ones indexed) if `latest` is set.
+    """
+    cond, params = to_sql(QueryParser(query).parse())
+    with open_index() as conn:
+        rows = conn.execute(
+            "SELECT d.project_id, d.version, d.doc FROM docs AS d "
+            + f"WHERE d.url = ? AND ({cond}) ORDER BY d.id",
+            [url] + params,
+        ).fetchall()
+        latest_versions = {}
+        if latest:
+            for project_id, version in conn.execute(
+                "SELECT DISTINCT project_id, version FROM docs WHERE url = ?", (url,)
+            ):
+                current = latest_versions.get(project_id)
+                if current is None or version_key(version) > version_key(current):
+                    latest_versions[project_id] = version
+
+    def gen():
+        for project_id, version, doc in rows:
+            if latest and latest_versions[project_id] != version:
+                continue
+            doc = json.loads(doc)
+            yield select_fields(doc, fields) if fields else doc
+
+    return gen()
+
+
+############
+# COMMANDS #
+############
+
+
+@app.command()
+def pull(
+    what: str = Argument(
+        None,
+        help="What to index: [project_id] for all versions of a project, "
+        + "[project_id@version] for a specific one, or a search query. "
+        + "Without it, all the sources already indexed in the current context "
+        + "are refreshed.",
+    ),
+    query: bool = Option(
+        False,
+        help="Consider [what] as a search query, even if it looks like a project ID",
+    ),
+    full: bool = Option(
+        False,
+        help="Pull all documents again, not only new versions, "
+        + "removing the ones gone remotely",
+    ),
+    verbose: bool = Option(
+        False,
+        help="Print information about what the command is performing",
+    ),
+):
+    """
+    Pull metadata documents into the local index, incrementally.
+    """
+    client = get_contextual_client()
+    url = load_current_context()["url"]
+    with open_index() as conn:
+        if what:
+            sources = [(what, query)]
+        else:
+            sources = [
+                (source, project_id is None)
+                for source, project_id in conn.execute(
+                    "SELECT what, project_id FROM sources WHERE url = ? ORDER BY id",
+                    (url,),
+                )
+            ]
+            if not sources:
+                print(
+                    "Nothing indexed yet in the current context, "
+                    + "see `index pull --help`"
+                )
+                raise Abort()
+        for source, is_query in sources:
+            if verbose:
+                print(f":inbox_tray: Pulling {source!r}")
+            counts = pull_source(conn, client, url, source, is_query, full)
+            print(
+                f":card_index: {source!r}: [blue]{counts['new']}[/blue] new, "
+                + f"{counts['updated']} updated, {counts['unchanged']} unchanged, "
+                + f"{counts['removed']} removed document(s)"
+            )
+
+
+@app.command()
+def ls():
+    """
+    List what's indexed locally, in the current context.
+    """
+    url = load_current_context()["url"]
+    with open_index() as conn:
+        rows = conn.execute(
+            "SELECT s.what, s.pulled_at, COUNT(m.doc) FROM sources AS s "
+            + "LEFT JOIN members AS m ON m.source = s.id WHERE s.url = ? "
+            + "GROUP BY s.id ORDER BY s.id",
+            (url,),
+        ).fetchall()
+    if not rows:
+        print("Nothing indexed in the current context")
+        return
+    for what, pulled_at, num in rows:
+        pulled = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(pulled_at or 0))
+        print(
+            f":card_index: {what!r}: [blue]{num}[/blue] document(s), "
+            + f"pulled on {pulled}"
+        )
+    print(f":floppy_disk: Index size: {format_size(get_index_path().stat().st_size)}")
+
+
+@app.command()
+def rm(
+    what: str = Argument(
+        None,
+        help="What to remove from the index, as passed to `index pull`",
+    ),
+    all: bool = Option(
+        False,
+        help="Remove everything indexed in the current context",
+    ),
+):
+    """
+    Remove documents from the local index, in the current context.
+    """
+    if not what and not all:
+        raise InvalidArgument("Specify what to remove, or --all")
+    url = load_current_context()["url"]
+    with open_index() as conn:
+        if all:
+            source_ids = conn.execute(
+                "SELECT id FROM sources WHERE url = ?", (url,)
+            ).fetchall()
+        else:
+            source_ids = conn.execute(
+                "SELECT id FROM sources WHERE url = ? AND what = ?", (url, what)
+            ).fetchall()
+        if not source_ids:
+            print(f"[red]{what!r} is not indexed[/red]" if what else "Nothing indexed")
+            raise Abort()
+        conn.executemany("DELETE FROM members WHERE source = ?", source_ids)
+        conn.executemany("DELETE FROM sources WHERE id = ?", source_ids)
+        num = delete_orphan_docs(conn, url)
+    print(f":broom: Removed {num} document(s) from the index")
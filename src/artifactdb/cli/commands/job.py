@@ -1,19 +1,29 @@
-import datetime
 import enum
 import json
+import time
+import random
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+
 import yaml
 from typer import Typer, Argument, Option, Exit
 from rich import print
 from rich.syntax import Syntax
 from rich.console import Console
+from rich.live import Live
+from rich.table import Table
 
 from artifactdb.utils.misc import get_class_from_classpath
 
 from ..cliutils import (
     get_contextual_client,
     load_current_context,
-    save_context,
+    migrate_context_jobs,
+    load_job_records,
+    load_job_record,
+    save_job_records,
     find_formatter_classpath,
+    RateLimiter,
 )
 
 
@@ -40,6 +50,17 @@ JOB_STATUS = enum.Enum(
     },
 )
 
+# job states not worth monitoring anymore
+TERMINATED_STATES = ("SUCCESS", "FAILURE")
+# normalized state of jobs without task, purged or unknown to the API
+PURGED_STATE = "purged"
+# `job wait` exit codes, for CI pipelines
+WAIT_EXIT_FAILURE = 1
+WAIT_EXIT_UNKNOWN = 2
+WAIT_EXIT_TIMEOUT = 124
+# how long (seconds) jobs without task are polled before giving up on them
+UNKNOWN_JOB_GRACE = 60.0
+
 #########
 # UTILS #
 #########
@@ -49,21 +70,15 @@ class PurgedJobError(Exception):
     pass
 
 
-def load_current_jobs():
+def load_current_context_name():
     ctx = load_current_context()
-    # backward compat
-    jobs = []
-    for job in ctx.get("jobs", []):
-        fixedjob = job
-        if not "job" in job:
-            fixedjob = {
-                "job": job,
-                "project_id": None,
-                "version": None,
-            }
-        jobs.append(fixedjob)
+    # jobs may still be recorded in the config
+    migrate_context_jobs(ctx)
+    return ctx["name"]
+
 
-    return jobs
+def load_current_jobs(status=None):
+    return load_job_records(load_current_context_name(), status=status)
 
 
 def list_job_ids():
@@ -72,10 +87,7 @@ def list_job_ids():
 
 
 def load_job(job_id):
-    jobs = load_current_jobs()
-    for job in jobs:
-        if job["job"]["job_id"] == job_id:
-            return job
+    return load_job_record(load_current_context_name(), job_id)
 
 
 def create_job(job_id):
@@ -145,22 +157,48 @@ def is_job_prunable(job_status, prunable_state):
         return True
 
 
-def save_current_context_jobs(jobs):
-    ctx = load_current_context()
-    ctx["jobs"] = jobs
-    save_context(name=ctx["name"], context=ctx, overwrite=True, quiet=True)
+def save_current_context_jobs(jobs, pruned_jobs=()):
+    """
+    Record updated `jobs` in current context, and remove `pruned_jobs`
+    """
+    save_job_records(
+        load_current_context_name(),
+        records=jobs,
+        deleted_job_ids=[job["job"]["job_id"] for job in pruned_jobs],
+    )
 
 
-def process_check_job(job, client, format, prune, verbose, updated_jobs):
+def fetch_job_status(job, client, rate_limiter=None):
+    if rate_limiter:
+        rate_limiter.wait()
     status = client.get_job_status(job["job"]["job_url"])
     # normalize to dict (error'd job are not parsed properly by models)
     if not isinstance(status, dict):
         status = json.loads(status.json())
+    return status
+
+
+def save_checked_jobs(jobs, updated_jobs):
+    """
+    Save `jobs` after they were checked: ones in `updated_jobs` are updated,
+    others were pruned.
+    """
+    kept = {job["job"]["job_id"] for job in updated_jobs}
+    pruned_jobs = [job for job in jobs if not job["job"]["job_id"] in kept]
+    save_current_context_jobs(updated_jobs, pruned_jobs)
+
+
+def process_check_job(job, client, format, prune, verbose, updated_jobs, status=None):
+    """
+    Check job status (unless already fetched and passed as `status`), display it and
+    append the job to `updated_jobs` if it's not to be pruned.
+    """
+    if status is None:
+        status = fetch_job_status(job, client)
     if format:
         if not isinstance(format, str):
             format = format.value
     format = None if format == "human" else format
-    job["job"]["status"] = status["status"]
     try:
         display_job_status(status, format=format, verbose=verbose)
     except PurgedJobError:
@@ -168,7 +206,8 @@ def process_check_job(job, client, format, prune, verbose, updated_jobs):
             f"Job [red]{job['job']['job_id']}[/red] was purged and is not available anymore (or is not running yet)"
         )
         # overwrite/normalize status value to decide further down if purgable or not
-        status["status"] = "purged"
+        status["status"] = PURGED_STATE
+    job["job"]["status"] = status["status"]
     # skip job if its state does not require to be pruned
     updated_jobs.append(job)
     if is_job_prunable(status, prune):
@@ -177,16 +216,125 @@ def process_check_job(job, client, format, prune, verbose, updated_jobs):
     return updated_jobs
 
 
-def check_all_jobs(jobs, client, format, prune, verbose):
+def fetch_all_job_statuses(jobs, client, pool, rate_limiter=None):
+    """
+    Fetch statuses for all jobs, using `pool` to send concurrent requests.
+    Statuses are yielded in the same order as `jobs`.
+    """
+    # map() yields results in order, as they become available
+    return pool.map(lambda job: fetch_job_status(job, client, rate_limiter), jobs)
+
+
+def check_all_jobs(
+    jobs, client, format, prune, verbose, workers=1, rate_limit=None
+):
+    """
+    Check all jobs, fetching statuses using `workers` concurrent requests, at most
+    `rate_limit` requests/second. Jobs are reported in the order they were recorded.
+    """
     updated_jobs = []
+    rate_limiter = RateLimiter(rate_limit)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = fetch_all_job_statuses(jobs, client, pool, rate_limiter)
+        for job, status in zip(jobs, statuses):
+            process_check_job(
+                job,
+                client,
+                format,
+                prune,
+                verbose,
+                updated_jobs=updated_jobs,
+                status=status,
+            )
+    save_checked_jobs(jobs, updated_jobs)
+
+
+def build_wait_table(jobs, statuses, elapsed):
+    table = Table(title=f"Waiting for jobs ({int(elapsed)}s)")
+    table.add_column("Job ID")
+    table.add_column("Project")
+    table.add_column("Status")
     for job in jobs:
-        if not job or not job["job"]:
-            print(f"[orange3]Found invalid job definition, discarded[/orange3]: {job}")
-            continue  # not part of what we later save
-        process_check_job(
-            job, client, format, prune, verbose, updated_jobs=updated_jobs
+        job_id = job["job"]["job_id"]
+        project = ""
+        if job.get("project_id"):
+            project = f"{job['project_id']}@{job.get('version')}"
+        status = statuses.get(job_id) or {}
+        state = status.get("status", "UNKNOWN")
+        if state == PURGED_STATE:
+            state = "PURGED/UNKNOWN"
+        color = {"SUCCESS": "green", "FAILURE": "red", "RUNNING": "orange3"}.get(
+            state, "blue"
         )
-    save_current_context_jobs(updated_jobs)
+        table.add_row(job_id, project, f"[{color}]{state}[/{color}]")
+    return table
+
+
+def wait_for_jobs(
+    jobs,
+    client,
+    timeout=None,
+    interval=1.0,
+    max_interval=60.0,
+    workers=1,
+    rate_limit=None,
+    unknown_grace=UNKNOWN_JOB_GRACE,
+):
+    """
+    Poll jobs statuses until they're all terminated, or `timeout` seconds elapsed.
+    Polling interval starts at `interval` seconds, and doubles (up to `max_interval`)
+    each time none of the jobs changed status, with some jitter to spread requests.
+    Return a dict of last known statuses per job ID, and whether all jobs terminated.
+    Jobs without task get status "purged": they may not be running yet, so they're
+    polled for `unknown_grace` seconds (or until `timeout`), then given up on, as
+    purged jobs or mistyped IDs would be reported pending forever.
+    """
+    statuses = {}
+    rate_limiter = RateLimiter(rate_limit)
+    start = time.monotonic()
+    delay = interval
+    elapsed = 0
+    console = Console()
+
+    def is_settled(job):
+        state = (statuses.get(job["job"]["job_id"]) or {}).get("status")
+        if state == PURGED_STATE:
+            return elapsed >= unknown_grace or (
+                timeout is not None and elapsed >= timeout
+            )
+        return state in TERMINATED_STATES
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, Live(
+        console=console, transient=True
+    ) as live:
+        while True:
+            waiting = [job for job in jobs if not is_settled(job)]
+            changed = False
+            for job, status in zip(
+                waiting, fetch_all_job_statuses(waiting, client, pool, rate_limiter)
+            ):
+                job_id = job["job"]["job_id"]
+                if not status.get("task_id"):
+                    status = dict(status or {}, status=PURGED_STATE)
+                previous = statuses.get(job_id) or {}
+                changed = changed or previous.get("status") != status.get("status")
+                statuses[job_id] = status
+            elapsed = time.monotonic() - start
+            live.update(build_wait_table(jobs, statuses, elapsed))
+            if all(is_settled(job) for job in jobs):
+                return statuses, True
+            if timeout is not None and elapsed >= timeout:
+                return statuses, False
+            delay = interval if changed else min(delay * 2, max_interval)
+            sleep = delay * random.uniform(0.8, 1.2)
+            if timeout is not None:
+                sleep = min(sleep, max(timeout - elapsed, 0))
+            if elapsed < unknown_grace and any(
+                statuses[job["job"]["job_id"]].get("status") == PURGED_STATE
+                for job in jobs
+            ):
+                sleep = min(sleep, unknown_grace - elapsed)
+            time.sleep(sleep)
 
 
 def check_one_job(job, client, format, prune, verbose):
@@ -197,31 +345,11 @@ def check_one_job(job, client, format, prune, verbose):
         updated = updated_jobs.pop()
         print(updated)
         # we need to record this job. maybe it's a manual entry or maybe
-        # it was there, recorded in the context, which would lead to a duplicate
-        jobs = load_current_jobs()
-        for i in range(len(jobs)):
-            existing = jobs[i]
-            if existing["job"]["job_id"] == updated["job"]["job_id"]:
-                # replace
-                jobs[i] = updated
-                break
-        else:
-            # was not there before, manual entry needed to be recorded
-            jobs.append(updated)
-            save_current_context_jobs(jobs)
+        # it was there, recorded in the context, in which case it's replaced
+        save_current_context_jobs([updated])
     else:
         # checked a job, but no updated job in returned, meaning it's purged.
-        # try to find it in current context's jobs
-        jobs = load_current_jobs()
-        idx = None
-        for i in range(len(jobs)):
-            existing = jobs[i]
-            if existing["job"]["job_id"] == job["job"]["job_id"]:
-                idx = i
-                break
-        if not idx is None:
-            jobs.pop(idx)
-            save_current_context_jobs(jobs)
+        save_current_context_jobs([], pruned_jobs=[job])
 
 
 ############
@@ -235,11 +363,15 @@ def list(
         False,
         help="Print all jobs information",
     ),
+    status: str = Option(
+        None,
+        help="Only list jobs with given last checked status (eg. `success`, `pending`, `failure`)",
+    ),
 ):
     """
     List all jobs recorded in current context, with last checked status.
     """
-    jobs = load_current_jobs()
+    jobs = load_current_jobs(status=status)
     # remove unnecessary details
     if not verbose:
         for key in (
@@ -248,7 +380,7 @@ def list(
         ):
             [_["job"].pop(key, None) for _ in jobs]
     if jobs:
-        jobs.sort(key=lambda e: e.get("created_at", datetime.datetime.fromtimestamp(0)))
+        # jobs come sorted by creation date
         console = Console()
         console.print(Syntax(yaml.dump(jobs), "yaml"))
     else:
@@ -273,6 +405,16 @@ def check(
     verbose: bool = Option(
         False, help="Display additional information about jobs (eg. traceback, etc...)"
     ),
+    workers: int = Option(
+        8,
+        help="Number of job statuses fetched concurrently, when checking all jobs",
+        min=1,
+    ),
+    rate_limit: float = Option(
+        None,
+        help="Maximum number of job status requests per second (no limit by default)",
+        min=0.1,
+    ),
 ):
     """
     Using active context, check status for all jobs, or given job ID. Jobs statuses are updated each they're checked.
@@ -288,4 +430,127 @@ def check(
     if requested_job:
         check_one_job(requested_job, client, format, prune, verbose)
     else:
-        check_all_jobs(jobs, client, format, prune, verbose)
+        check_all_jobs(
+            jobs,
+            client,
+            format,
+            prune,
+            verbose,
+            workers=workers,
+            rate_limit=rate_limit,
+        )
+
+
+@app.command()
+def wait(
+    job_ids: List[str] = Argument(
+        None,
+        help="Job IDs to wait for (all recorded jobs not terminated yet if omitted). Job IDs "
+        + "can be ones recorded in the context, or manual entries.",
+        autocompletion=list_job_ids,
+    ),
+    timeout: float = Option(
+        None,
+        help="Stop waiting after given number of seconds, exiting with code "
+        + f"{WAIT_EXIT_TIMEOUT}. Wait forever if omitted.",
+        min=0,
+    ),
+    interval: float = Option(
+        1.0,
+        help="Initial polling interval, in seconds. The interval doubles each time "
+        + "no job changed status, up to --max-interval",
+        min=0.1,
+    ),
+    max_interval: float = Option(
+        60.0,
+        help="Maximum polling interval, in seconds",
+        min=0.1,
+    ),
+    format: FORMATS = Option(
+        FORMATS.human.value,
+        help="Return final job status in specified format, default is human-readable",
+    ),
+    prune: JOB_STATUS = Option(
+        JOB_STATUS.success.value,
+        help="Prune jobs with given status after reporting it",
+    ),
+    verbose: bool = Option(
+        False, help="Display additional information about jobs (eg. traceback, etc...)"
+    ),
+    workers: int = Option(
+        8,
+        help="Number of job statuses fetched concurrently",
+        min=1,
+    ),
+    rate_limit: float = Option(
+        None,
+        help="Maximum number of job status requests per second (no limit by default)",
+        min=0.1,
+    ),
+    unknown_grace: float = Option(
+        UNKNOWN_JOB_GRACE,
+        help="Keep polling jobs unknown to the API (not running yet, purged, or "
+        + "mistyped job ID) for this number of seconds, before giving up on them "
+        + f"and exiting with code {WAIT_EXIT_UNKNOWN}",
+        min=0,
+    ),
+):
+    """
+    Wait for jobs to terminate, showing their statuses as they change, then report
+    them like `job check` does. Exits with code 0 if all jobs succeeded, 1 if any
+    failed, 2 if any is still unknown, 124 on timeout.
+    """
+    if job_ids:
+        jobs = [load_job(job_id) or create_job(job_id) for job_id in job_ids]
+    else:
+        jobs = [
+            job
+            for job in load_current_jobs()
+            if job["job"].get("status") not in TERMINATED_STATES + (PURGED_STATE,)
+        ]
+        if not jobs:
+            print("No running jobs recorded in current context, nothing to wait for")
+            raise Exit(0)
+    client = get_contextual_client()
+    statuses, terminated = wait_for_jobs(
+        jobs,
+        client,
+        timeout=timeout,
+        interval=interval,
+        max_interval=max(interval, max_interval),
+        workers=workers,
+        rate_limit=rate_limit,
+        unknown_grace=unknown_grace,
+    )
+    # final report, and save jobs statuses once
+    updated_jobs = []
+    for job in jobs:
+        process_check_job(
+            job,
+            client,
+            format,
+            prune,
+            verbose,
+            updated_jobs=updated_jobs,
+            status=statuses[job["job"]["job_id"]],
+        )
+    save_checked_jobs(jobs, updated_jobs)
+
+    purged = [
+        job_id
+        for job_id, status in statuses.items()
+        if status.get("status") == PURGED_STATE
+    ]
+    if purged:
+        print(
+            f"[orange3]{len(purged)} job(s) purged or unknown[/orange3], "
+            + "gave up waiting for: "
+            + ", ".join(purged)
+        )
+    if not terminated:
+        print(f"[orange3]Timeout[/orange3], jobs still running after {timeout}s")
+        raise Exit(WAIT_EXIT_TIMEOUT)
+    if any(status.get("status") == "FAILURE" for status in statuses.values()):
+        raise Exit(WAIT_EXIT_FAILURE)
+    if purged:
+        raise Exit(WAIT_EXIT_UNKNOWN)
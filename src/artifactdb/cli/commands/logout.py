@@ -4,6 +4,7 @@ from rich import print
 from ..cliutils import (
     load_current_context,
     get_contextual_client,
+    clear_client_cache,
     save_context,
 )
 
@@ -27,6 +28,8 @@ def logout_command(
         if client._auth:
             print(":broom: Removing cached credentials")
             client._auth._cache_file.unlink()
+        # cached clients still hold the credentials in memory
+        clear_client_cache()
     ctx = load_current_context()
     ctx["auth"]["anonymous"] = True
     save_context(ctx["name"], ctx, overwrite=True, quiet=True)
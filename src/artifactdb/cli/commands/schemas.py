@@ -1,15 +1,32 @@
 from rich import print
 from rich.syntax import Syntax
 from rich.console import Console
-from typer import Typer, Option, Argument
+from typer import Typer, Option, Argument, Exit
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urljoin, urldefrag
+import re
+import builtins
 import yaml
 import json
 
+try:
+    import jsonschema
+except ImportError:
+    # optional, required for local validation only
+    jsonschema = None
+try:
+    # jsonschema >= 4.18, to resolve references between schemas
+    import referencing
+    import referencing.jsonschema
+except ImportError:
+    referencing = None
+
 from ..cliutils import (
     get_contextual_client,
     list_format_names,
     find_formatter_classpath,
+    InvalidArgument,
 )
 
 from artifactdb.utils.misc import get_class_from_classpath
@@ -20,6 +37,12 @@ COMMAND_NAME = "schemas"
 app = Typer(help="Menage project schemas.")
 
 DEFAULT_FORMATTER_CLASS = YamlFormatter
+# `$schema` is looked for in the first bytes of JSON documents
+SCHEMA_SNIFF_SIZE = 64 * 1024
+SCHEMA_ID_RE = re.compile(r'"\$schema"\s*:\s*"((?:[^"\\]|\\.)*)"')
+SNIFF_WORKERS = 8
+# schemas without `$schema` are considered draft 7, as ArtifactDB schemas
+DEFAULT_SPECIFICATION = referencing.jsonschema.DRAFT7 if referencing else None
 
 #########
 # UTILS #
@@ -99,6 +122,194 @@ def validate_document(path):
     return res.json()
 
 
+def parse_schema_id(schema_id):
+    """
+    Extract document type and version from a `$schema` value,
+    eg. "csv_data_frame/v1.json" => ("csv_data_frame", "v1")
+    """
+    parts = schema_id.rstrip("/").split("/")
+    if len(parts) < 2:
+        raise ValueError(f"Unable to parse $schema {schema_id!r}")
+    doc_type, version = parts[-2:]
+    if version.endswith(".json"):
+        version = version[: -len(".json")]
+    return doc_type, version
+
+
+def sniff_schema_id(path):
+    """
+    Return `$schema` value of a JSON document, looking at the beginning of the file
+    only, without parsing the whole document (None if not found there)
+    """
+    with open(path, "rb") as json_file:
+        head = json_file.read(SCHEMA_SNIFF_SIZE).decode(errors="ignore")
+    match = SCHEMA_ID_RE.search(head)
+    return json.loads(f'"{match.group(1)}"') if match else None
+
+
+def iter_refs(schema):
+    if isinstance(schema, dict):
+        if isinstance(schema.get("$ref"), str):
+            yield schema["$ref"]
+        for value in schema.values():
+            yield from iter_refs(value)
+    elif isinstance(schema, builtins.list):  # `list` is a command here
+        for value in schema:
+            yield from iter_refs(value)
+
+
+def get_schema_refs(uri, schema):
+    """
+    Return URIs of the schemas referenced by `schema`, resolved against its `$id`
+    (or `uri` if it has none), internal references excluded
+    """
+    base = schema.get("$id", uri)
+    refs = {urldefrag(urljoin(base, ref)).url for ref in iter_refs(schema)}
+    refs.discard(urldefrag(base).url)
+    refs.discard("")
+    return refs
+
+
+def fetch_schemas(schema_ids, schema_client=None):
+    """
+    Fetch schemas `schema_ids` from the API, along with all the schemas they reference
+    through `$ref`. Return a dict of schemas per URI, for the ones which can be fully
+    resolved (fetched, and all their references too).
+    """
+    schemas = {}
+    todo = [*schema_ids]
+    while todo:
+        uri = todo.pop()
+        if uri in schemas:
+            continue
+        try:
+            doc_type, version = parse_schema_id(uri)
+            schema = get_schema(doc_type, version, schema_client)
+        except Exception as exc:
+            print(f"[bright_black]Unable to fetch schema {uri!r}: {exc}[/bright_black]")
+            schemas[uri] = None
+            continue
+        # relative references are resolved against the schema URI
+        schema.setdefault("$id", uri)
+        schemas[uri] = schema
+        todo.extend(get_schema_refs(uri, schema))
+
+    def resolvable(uri, seen):
+        if schemas.get(uri) is None:
+            return False
+        seen.add(uri)
+        return all(
+            ref in seen or resolvable(ref, seen)
+            for ref in get_schema_refs(uri, schemas[uri])
+        )
+
+    return {uri: schema for uri, schema in schemas.items() if resolvable(uri, set())}
+
+
+def local_validation_available():
+    return jsonschema is not None
+
+
+# validators, compiled once per (worker) process
+_VALIDATORS = {}
+
+
+def init_validators(schemas):
+    """
+    Compile validators for all `schemas`, references between them being
+    resolved from that same set of schemas
+    """
+    _VALIDATORS.clear()
+    if referencing is not None:
+        resources = [
+            (
+                uri,
+                referencing.Resource.from_contents(
+                    schema, default_specification=DEFAULT_SPECIFICATION
+                ),
+            )
+            for uri, schema in schemas.items()
+        ]
+        registry = referencing.Registry().with_resources(resources)
+    for schema_id, schema in schemas.items():
+        validator_class = jsonschema.validators.validator_for(schema)
+        if referencing is not None:
+            _VALIDATORS[schema_id] = validator_class(schema, registry=registry)
+        else:
+            # jsonschema < 4.18
+            resolver = jsonschema.RefResolver(schema["$id"], schema, store=schemas)
+            _VALIDATORS[schema_id] = validator_class(schema, resolver=resolver)
+
+
+def validate_file(path):
+    """
+    Validate JSON document against its `$schema`. Return the `$schema` value and a
+    list of errors, errors being None if the document couldn't be validated locally
+    (documents without `$schema` are not validated)
+    """
+    try:
+        with open(path) as json_file:
+            doc = json.load(json_file)
+    except json.JSONDecodeError as exc:
+        return None, [f"Invalid JSON: {exc}"]
+    schema_id = doc.get("$schema") if isinstance(doc, dict) else None
+    if schema_id is None:
+        return None, []
+    validator = _VALIDATORS.get(schema_id)
+    if validator is None:
+        return schema_id, None
+    try:
+        return schema_id, [
+            "{}: {}".format(
+                "/".join(map(str, error.absolute_path)) or "<root>", error.message
+            )
+            for error in validator.iter_errors(doc)
+        ]
+    except Exception:
+        # eg. reference still unresolvable, left to API validation
+        return schema_id, None
+
+
+def validate_documents_locally(paths, schema_client=None, workers=None):
+    """
+    Validate JSON documents (file paths) against their schemas, using a pool of
+    processes. Schemas, found at the beginning of the documents, are fetched from the
+    API once, along with the schemas they reference, and compiled into validators in
+    each worker process. Documents are then read and validated in one pass. Return a
+    dict of errors per path, for invalid documents only, and the list of paths which
+    couldn't be validated locally (schema not found or not resolvable), left to
+    API validation.
+    """
+    if jsonschema is None:
+        raise InvalidArgument("Local validation requires the `jsonschema` package")
+    paths = [str(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=SNIFF_WORKERS) as pool:
+        schema_ids = set(pool.map(sniff_schema_id, paths))
+    schema_ids.discard(None)
+    schemas = fetch_schemas(sorted(schema_ids), schema_client)
+    errors = {}
+    unvalidated = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_validators, initargs=(schemas,)
+    ) as pool:
+        for path, (schema_id, doc_errors) in zip(
+            paths, pool.map(validate_file, paths, chunksize=64)
+        ):
+            if doc_errors is None:
+                unvalidated.append(path)
+            elif doc_errors:
+                errors[path] = doc_errors
+    return errors, unvalidated
+
+
+def report_validation_errors(errors):
+    for path, doc_errors in errors.items():
+        print(f":x: [red]{path}[/red]")
+        for error in doc_errors:
+            print(f"   {error}")
+    print(f"[red]{len(errors)} invalid document(s)[/red]")
+
+
 ############
 # COMMANDS #
 ############
@@ -155,12 +366,36 @@ def get(
 def validate(
     path: Path = Argument(
         ..., help="Provide path to metadata file that needs to be validated."
-    )
+    ),
+    local: bool = Option(
+        False,
+        help="Validate locally, using the JSON schemas fetched from the API. A folder "
+        + "can then be passed, validating all the JSON files it contains.",
+    ),
+    client: str = Option(None, help="Name of schema client"),
 ):
     """
     Check the given documents are valid or not
     """
-    print(validate_document(path))
+    if not local:
+        print(validate_document(path))
+        return
+    paths = sorted(path.rglob("*.json")) if path.is_dir() else [path]
+    errors, unvalidated = validate_documents_locally(paths, schema_client=client)
+    for unknown in unvalidated:
+        print(f":grey_question: [orange3]{unknown}[/orange3]: schema not resolvable")
+    if errors:
+        report_validation_errors(errors)
+        raise Exit(1)
+    print(
+        f":white_check_mark: {len(paths) - len(errors) - len(unvalidated)} "
+        + "document(s) valid"
+    )
+    if unvalidated:
+        print(
+            f"[orange3]{len(unvalidated)} document(s) not validated, "
+            + "schema not resolvable locally[/orange3]"
+        )
 
 
 @app.command()
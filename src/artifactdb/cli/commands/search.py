@@ -1,3 +1,9 @@
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+
 import yaml
 from typer import Typer, Argument, Option, Abort
 from rich import print
@@ -14,7 +20,11 @@ from ..cliutils import (
     delete_search_profile,
     list_format_names,
     find_formatter_classpath,
+    prefetch,
+    load_current_context,
+    get_search_cache_path,
 )
+from .index import search_index
 
 
 # single/main command is "upload" with one entrypoint:
@@ -24,6 +34,12 @@ COMMAND_FUNC = "search_command"
 app = Typer(help="Searching metadata")
 
 DEFAULT_FORMATTER_CLASS = YamlFormatter
+# number of pages of results fetched ahead, while the current one is displayed
+PREFETCH_PAGES = 2
+# search results cache: default time-to-live (seconds), and maximum size (bytes,
+# compressed), least recently used results being evicted above
+DEFAULT_CACHE_TTL = 600
+CACHE_MAX_SIZE = 256 * 1024 * 1024
 
 #########
 # UTILS #
@@ -35,6 +51,95 @@ def get_search_profile_names():
     return sorted(profiles.keys())
 
 
+def get_cache_key(url, query, fields, latest):
+    # queries only differing by whitespaces are the same
+    normalized = [url, " ".join(query.split()), fields or None, bool(latest)]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def open_search_cache():
+    conn = sqlite3.connect(get_search_cache_path(), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created_at REAL, "
+        + "accessed_at REAL, size INTEGER, docs BLOB)"
+    )
+    return conn
+
+
+def load_cached_results(key, ttl):
+    """
+    Return cached search results for `key`, if not older than `ttl` seconds,
+    along with their age. Return (None, None) otherwise.
+    """
+    conn = open_search_cache()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT created_at, docs FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if not row or now - row[0] > ttl:
+                return None, None
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+    finally:
+        conn.close()
+    return json.loads(zlib.decompress(row[1])), now - row[0]
+
+
+def save_cached_results(key, blob):
+    """
+    Store search results, compressed as `blob`, under `key`, evicting least recently
+    used results if the cache grows above CACHE_MAX_SIZE
+    """
+    now = time.time()
+    conn = open_search_cache()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(blob), blob),
+            )
+            total = conn.execute("SELECT SUM(size) FROM results").fetchone()[0]
+            rows = conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed_at"
+            ).fetchall()
+            for old_key, size in rows:
+                if total <= CACHE_MAX_SIZE:
+                    break
+                conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                total -= size
+    finally:
+        conn.close()
+
+
+def cache_results(gen, key):
+    """
+    Yield results from `gen`, storing them in the cache under `key` once all
+    of them were consumed (partial results aren't cached). Results are compressed
+    as they come, caching being given up if they exceed CACHE_MAX_SIZE, so results
+    aren't all kept in memory.
+    """
+    compressor = zlib.compressobj()
+    chunks = [compressor.compress(b"[")]
+    size = 0
+    separator = b""
+    for doc in gen:
+        if chunks is not None:
+            chunk = compressor.compress(separator + json.dumps(doc).encode())
+            separator = b","
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > CACHE_MAX_SIZE:
+                chunks = compressor = None  # too big, not cached
+        yield doc
+    if chunks is not None:
+        chunks.append(compressor.compress(b"]"))
+        chunks.append(compressor.flush())
+        blob = b"".join(chunks)
+        if len(blob) <= CACHE_MAX_SIZE:
+            save_cached_results(key, blob)
+
+
 ############
 # COMMANDS #
 ############
@@ -72,11 +177,48 @@ def search_command(
         min=1,
         max=100,
     ),
+    all: bool = Option(
+        False,
+        "--all",
+        help="Return all results at once, without asking for more after each page "
+        + "(for scripts and pipelines)",
+    ),
+    limit: int = Option(
+        None,
+        help="Return at most this number of results, without asking for more after each page",
+        min=1,
+    ),
     format: str = Option(
         None,
-        help="Format used to display results. Default is YAML format.",
+        help="Format used to display results. Default is YAML format. `ndjson` writes one "
+        + "JSON document per line, `csv`, `tsv`, `parquet` and `arrow` one row per result, "
+        + "with --fields as columns. These ones aren't paginated, suitable for exports and pipes.",
         autocompletion=list_format_names,
     ),
+    cache: bool = Option(
+        False,
+        help="Use a local cache of search results: the same search, within the same context, "
+        + "is served from the cache for --cache-ttl seconds",
+    ),
+    cache_ttl: int = Option(
+        DEFAULT_CACHE_TTL,
+        help="Requires --cache. Number of seconds search results are kept in the cache",
+        min=0,
+    ),
+    refresh: bool = Option(
+        False,
+        help="Requires --cache. Ignore cached results, search again and update the cache",
+    ),
+    offline: bool = Option(
+        False,
+        help="Search metadata documents indexed locally (see `index pull`), without "
+        + "contacting the API. Latest versions are the latest ones indexed.",
+    ),
+    batch_size: int = Option(
+        None,
+        help="Number of results written at once, by tabular formats (csv, tsv, parquet, arrow)",
+        min=1,
+    ),
     # search profile related options
     save: str = Option(
         None,
@@ -141,10 +283,7 @@ def search_command(
     profile = {}
     if load:
         profile = load_search_profiles(load)
-        if profile:
-            if verbose:
-                print(f"Using search profile {load!r}")
-        else:
+        if not profile:
             print(f"No such search profile named [red]{load!r}[/red]")
             raise Abort()
         # explicitely passed params have precedence over of the profile ones
@@ -156,14 +295,28 @@ def search_command(
         # always taken from the profile...
         latest = latest or profile.get("latest")
         size = size or profile.get("size")
+        all = all or profile.get("all", False)
+        limit = limit or profile.get("limit")
         format = format or profile.get("format")
+        cache = cache or profile.get("cache", False)
+        if cache_ttl == DEFAULT_CACHE_TTL:
+            cache_ttl = profile.get("cache_ttl", cache_ttl)
+
+    # load formatter or use default one
+    fmt_class = DEFAULT_FORMATTER_CLASS
+    fmt_classpath = find_formatter_classpath(format)
+    if fmt_classpath:
+        fmt_class = get_class_from_classpath(fmt_classpath)
+    # machine-readable output isn't paginated, messages go to stderr not to mix with data
+    messages = Console(stderr=fmt_class.MACHINE_READABLE)
+    if load and verbose:
+        messages.print(f"Using search profile {load!r}")
 
-    client = get_contextual_client()
     if query is None:
         query = "*"
     query = query.strip()
     if version and latest:
-        print("[orange]Using `version` with `latest` arguments is not recommended")
+        messages.print("[orange]Using `version` with `latest` arguments is not recommended")
     if project_id:
         query += f' AND _extra.project_id:"{project_id}"'
     if version:
@@ -177,12 +330,9 @@ def search_command(
     if not size:
         size = 50
 
-    # load formatter or use default one
-    fmt_class = DEFAULT_FORMATTER_CLASS
-    fmt_classpath = find_formatter_classpath(format)
-    if fmt_classpath:
-        fmt_class = get_class_from_classpath(fmt_classpath)
     fmt = fmt_class()
+    fmt.fields = fields
+    fmt.batch_size = batch_size
 
     if save:
         save_search_profile(
@@ -194,23 +344,57 @@ def search_command(
                 "version": version,
                 "latest": latest,
                 "size": size,
+                "all": all,
+                "limit": limit,
                 "format": format,
+                "cache": cache,
+                "cache_ttl": cache_ttl,
             },
         )
 
+    paginate = not (fmt.MACHINE_READABLE or all or limit)
     count = 0
+    total = 0
     found = False
-    gen = client.search(query=query, fields=fields, latest=latest)
-    for doc in gen:
-        found = True
-        fmt.format_result(doc, console)
-        count += 1
-        if count == size:
-            if Confirm.ask("More", default="y"):
-                count = 0
-            else:
-                raise Abort()
-    if found:
-        print("[bright_black]No more results[/bright_black]")
+    gen = None
+    if offline:
+        url = load_current_context()["url"]
+        gen = search_index(url, query, fields=fields, latest=latest)
+    elif cache:
+        # client not even created if results are cached
+        key = get_cache_key(load_current_context()["url"], query, fields, latest)
+        if not refresh:
+            cached, age = load_cached_results(key, cache_ttl)
+            if cached is not None:
+                gen = iter(cached)
+                if verbose:
+                    messages.print(f"Results from local cache ({int(age)}s old)")
+    if gen is None:
+        client = get_contextual_client()
+        gen = client.search(query=query, fields=fields, latest=latest)
+        if cache:
+            gen = cache_results(gen, key)
+    # next pages are fetched in the background while current results are formatted
+    docs = prefetch(gen, maxsize=PREFETCH_PAGES * size)
+    try:
+        for doc in docs:
+            found = True
+            fmt.format_result(doc, console)
+            count += 1
+            total += 1
+            if limit and total == limit:
+                break
+            if paginate and count == size:
+                if Confirm.ask("More", default="y"):
+                    count = 0
+                else:
+                    raise Abort()
+    finally:
+        docs.close()
+        fmt.close(console)
+    if limit and total == limit:
+        messages.print(f"[bright_black]Limit of {limit} results reached[/bright_black]")
+    elif found:
+        messages.print("[bright_black]No more results[/bright_black]")
     else:
-        print("[orange3]No results[/orange3]")
+        messages.print("[orange3]No results[/orange3]")
@@ -0,0 +1,245 @@
+import json
+import pathlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from typer import Typer, Argument, Option, Abort
+from rich import print
+
+from artifactdb.identifiers.aid import pack_id
+from ..cliutils import (
+    get_contextual_client,
+    call_with_retry,
+    atomic_write,
+    format_size,
+    InvalidArgument,
+    parse_artifactdb_notation,
+    resolve_latest_version,
+    list_artifacts,
+)
+from .download import (
+    stream_artifact,
+    is_artifact_complete,
+    record_manifest_entry,
+    DEFAULT_CHUNK_SIZE,
+)
+
+
+COMMAND_NAME = "sync"
+COMMAND_FUNC = "sync_command"
+
+app = Typer(help="Mirror a project into a local folder")
+
+# sync state, stored at the root of the local mirror
+SYNC_STATE_FILE = ".adb-sync.json"
+
+#########
+# UTILS #
+#########
+
+
+def get_sync_state_path(dest):
+    return pathlib.Path(dest, SYNC_STATE_FILE)
+
+
+def load_sync_state(dest, project_id):
+    """
+    Load sync state of the local mirror `dest`, checking it's a mirror of `project_id`
+    (a new state is returned if `dest` was never synced)
+    """
+    try:
+        state = json.load(open(get_sync_state_path(dest)))
+    except FileNotFoundError:
+        return {"project_id": project_id, "version": None, "artifacts": {}}
+    except json.JSONDecodeError:
+        print(f"[orange3]Ignoring corrupted sync state in '{dest}'[/orange3]")
+        return {"project_id": project_id, "version": None, "artifacts": {}}
+    if state["project_id"] != project_id:
+        raise InvalidArgument(
+            f"Folder '{dest}' is a mirror of project {state['project_id']!r}, "
+            + f"not {project_id!r}"
+        )
+    return state
+
+
+def save_sync_state(state, dest):
+    atomic_write(get_sync_state_path(dest), json.dumps(state))
+
+
+def plan_sync(artifacts, state, dest, jobs=1):
+    """
+    Compare remote `artifacts` (see list_artifacts()) with local files in `dest` and
+    previous sync `state`. Return the artifacts to download, along with the reason
+    ("new" or "changed"), the ones already up-to-date, and the paths previously synced
+    which are now gone remotely. Local checksums are computed in parallel, only
+    for files modified since the last sync.
+    """
+
+    def check(info):
+        tgt = pathlib.Path(dest, info["path"])
+        if is_artifact_complete(info, tgt, state["artifacts"].get(info["path"])):
+            return None
+        return "changed" if tgt.exists() else "new"
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        reasons = pool.map(check, artifacts)
+        to_download = []
+        uptodate = []
+        for info, reason in zip(artifacts, reasons):
+            if reason:
+                to_download.append((info, reason))
+            else:
+                uptodate.append(info)
+    remote_paths = {info["path"] for info in artifacts}
+    gone = sorted(set(state["artifacts"]).difference(remote_paths))
+    return to_download, uptodate, gone
+
+
+def delete_local_file(dest, path):
+    """
+    Delete `path` from local mirror `dest`, along with parent folders left empty
+    """
+    tgt = pathlib.Path(dest, path)
+    tgt.unlink(missing_ok=True)
+    root = pathlib.Path(dest).resolve()
+    parent = tgt.parent.resolve()
+    while parent != root and root in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            break  # not empty
+        parent = parent.parent
+
+
+def sync_artifacts(client, state, to_download, dest, stream_opts, jobs=1, retries=0):
+    """
+    Download `to_download` artifacts in parallel, recording them in sync `state`
+    as they're completed. Yield each artifact's info once downloaded.
+    """
+    project_id, version = state["project_id"], state["version"]
+
+    def fetch(info):
+        aid = pack_id(dict(project_id=project_id, version=version, path=info["path"]))
+        tgt = pathlib.Path(dest, info["path"])
+        call_with_retry(
+            stream_artifact, client, aid, tgt, **stream_opts, retries=retries
+        )
+        return tgt
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(fetch, info): info for info, _ in to_download}
+        try:
+            for future in as_completed(futures):
+                info = futures[future]
+                record_manifest_entry(state, info, future.result())
+                yield info
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+############
+# COMMANDS #
+############
+
+
+def sync_command(
+    what: str = Argument(
+        ...,
+        help="Project to mirror, [project_id] for the latest version, or "
+        + "[project_id@version] for a specific version",
+    ),
+    dest: str = Argument(
+        ...,
+        help="Local folder mirroring the project",
+    ),
+    delete: bool = Option(
+        False,
+        help="Delete local files previously synced, which don't exist anymore in the "
+        + "project version. Other local files are left untouched.",
+    ),
+    dry_run: bool = Option(
+        False,
+        help="Only report what would be downloaded and deleted, without changing anything",
+    ),
+    jobs: int = Option(
+        4,
+        help="Number of artifacts downloaded in parallel",
+        min=1,
+    ),
+    retries: int = Option(
+        2,
+        help="Number of times a failing artifact download is retried before giving up",
+        min=0,
+    ),
+    chunk_size: int = Option(
+        DEFAULT_CHUNK_SIZE,
+        help="Size of the chunks written to disk, in MiB",
+        min=1,
+    ),
+    verbose: bool = Option(
+        False,
+        help="Print information about what the command is performing",
+    ),
+):
+    """
+    Mirror a project version into a local folder, downloading only new or modified artifacts.
+    """
+    project_id, version, path = parse_artifactdb_notation(what, None, None, None)
+    if path:
+        raise InvalidArgument("Only projects can be synced, not single artifacts")
+    client = get_contextual_client()
+    if version is None or version.lower() == "latest":
+        version = resolve_latest_version(client, project_id)
+    dest = pathlib.Path(dest).expanduser()
+    state = load_sync_state(dest, project_id)
+    if state["version"] and state["version"] != version:
+        print(
+            f":arrows_counterclockwise: Syncing '{dest}' from version "
+            + f"{state['version']!r} to {version!r}"
+        )
+
+    artifacts = list(list_artifacts(client, project_id, version))
+    if not artifacts:
+        print(f"No artifacts found for '{project_id}@{version}'")
+        raise Abort()
+    to_download, uptodate, gone = plan_sync(artifacts, state, dest, jobs)
+    to_delete = gone if delete else []
+    download_size = sum(info["size"] or 0 for info, _ in to_download)
+
+    if dry_run or verbose:
+        for info, reason in to_download:
+            sign = "[green]+[/green]" if reason == "new" else "[yellow]~[/yellow]"
+            print(f"{sign} {info['path']} ({format_size(info['size'] or 0)})")
+        for path in to_delete:
+            print(f"[red]-[/red] {path}")
+    summary = (
+        f"{len(to_download)} artifact(s) to download ({format_size(download_size)}), "
+        + f"{len(to_delete)} to delete, {len(uptodate)} up-to-date"
+    )
+    if gone and not delete:
+        # still tracked in sync state, so a later --delete run can remove them
+        summary += f", {len(gone)} gone remotely (kept, see --delete)"
+    if dry_run:
+        print(f":mag: Dry run, {summary}")
+        return
+    print(f":arrows_counterclockwise: Syncing {project_id}@{version} into '{dest}': {summary}")
+
+    dest.mkdir(parents=True, exist_ok=True)
+    state["version"] = version
+    for info in uptodate:
+        record_manifest_entry(state, info, pathlib.Path(dest, info["path"]))
+    try:
+        stream_opts = {"chunk_size": chunk_size}
+        for num, info in enumerate(
+            sync_artifacts(client, state, to_download, dest, stream_opts, jobs, retries),
+            start=1,
+        ):
+            if verbose:
+                print(f":inbox_tray: [{num}/{len(to_download)}] {info['path']}")
+        for path in to_delete:
+            delete_local_file(dest, path)
+            state["artifacts"].pop(path, None)
+    finally:
+        save_sync_state(state, dest)
+    print(":white_check_mark: Sync completed")
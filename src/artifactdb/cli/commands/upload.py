@@ -1,22 +1,58 @@
+import os
+import time
 import enum
+import queue
+import base64
+import threading
+import inspect
+import hashlib
+import sqlite3
 import pathlib
 import datetime
 import json
+import csv
+import urllib.parse
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    ProcessPoolExecutor,
+    wait,
+    as_completed,
+    FIRST_COMPLETED,
+)
+
+import click
+
 import jose.jwt
 import yaml
 import dateparser
-from typer import Typer, Argument, Option, Abort
+import requests
+from typer import Typer, Argument, Option, Abort, Exit, BadParameter
 from rich import print
 from rich.prompt import Confirm
 from rich.syntax import Syntax
 from rich.console import Console
+from rich.table import Table
 
 from ..cliutils import (
     get_contextual_client,
+    get_config_directory,
     register_job,
+    register_jobs,
+    call_with_retry,
+    atomic_write,
+    compute_md5,
+    format_size,
+    get_artifact_info,
     PermissionsInfo,
     InvalidArgument,
     ROLE_ACCESS,
+    STORAGE_TIMEOUT,
+    YamlLoader,
+)
+from .schemas import (
+    local_validation_available,
+    validate_documents_locally,
+    report_validation_errors,
 )
 
 
@@ -34,12 +70,895 @@ UPLOAD_MODES = enum.Enum(
     },
 )
 
+# number of files uploaded in parallel by resumable uploads, by default
+DEFAULT_UPLOAD_JOBS = 4
+# client's upload_project() transfer parameters, and the corresponding options
+TRANSFER_OPTIONS = {
+    "max_workers": "--jobs",
+    "multipart_chunksize": "--part-size",
+    "max_concurrency": "--part-concurrency",
+}
+# save checkpoint every N uploaded files (and when the upload stops)
+CHECKPOINT_EVERY = 50
+# presigned URLs expiring within that many seconds are considered expired
+PRESIGNED_URL_MARGIN = 60
+# metadata documents sent per API validation request (number and size in bytes)
+VALIDATE_BATCH_DOCS = 500
+VALIDATE_BATCH_SIZE = 8 * 1024 * 1024
+# number of directories scanned in parallel in the staging folder
+SCAN_WORKERS = 16
+# number of staging folders uploaded concurrently in batch mode, by default
+DEFAULT_BATCH_JOBS = 4
+# fields allowed in a batch upload manifest
+BATCH_FIELDS = (
+    "staging_dir",
+    "project_id",
+    "version",
+    "owners",
+    "viewers",
+    "read_access",
+    "write_access",
+    "expires_in",
+    "completed_by",
+)
+
 
 #########
 # UTILS #
 #########
 
 
+class PresignedURLRejected(Exception):
+    pass
+
+
+def scan_directory(path):
+    """
+    Scan one directory, returning (path, stat) for each file,
+    and the list of sub-directories
+    """
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            # same as os.walk(), not following symlinks to directories
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                files.append((entry.path, entry.stat()))
+    return files, subdirs
+
+
+def scan_staging_dir(staging_path, workers=SCAN_WORKERS):
+    """
+    Walk staging folder once, scanning sub-directories in parallel, and return
+    an index of its files: a dict keyed by path relative to the staging folder,
+    with size, modification time, device and inode, sorted by path.
+    """
+    root = str(staging_path)
+    index = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(scan_directory, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for full_path, stat in files:
+                    relpath = pathlib.PurePath(os.path.relpath(full_path, root))
+                    index[relpath.as_posix()] = {
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime,
+                        "device": stat.st_dev,
+                        "inode": stat.st_ino,
+                    }
+                pending.update(pool.submit(scan_directory, _) for _ in subdirs)
+    return dict(sorted(index.items()))
+
+
+def get_hashes_db_path():
+    return pathlib.Path(get_config_directory(), "hashes.db")
+
+
+def hash_staging_files(staging_path, files, workers=None):
+    """
+    Compute md5 checksum for each file in `files` index (see scan_staging_dir()),
+    stored in each file's entry. Checksums are cached locally, by inode, size and
+    modification time, so unchanged files are never hashed twice. Others are
+    hashed using a pool of `workers` processes.
+    """
+    db_path = get_hashes_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (device INTEGER, inode INTEGER, "
+            + "size INTEGER, mtime REAL, md5 TEXT, PRIMARY KEY (device, inode))"
+        )
+        to_hash = []
+        for relpath, info in files.items():
+            row = conn.execute(
+                "SELECT md5 FROM hashes WHERE device = ? AND inode = ? "
+                + "AND size = ? AND mtime = ?",
+                (info["device"], info["inode"], info["size"], info["mtime"]),
+            ).fetchone()
+            if row:
+                info["md5"] = row[0]
+            else:
+                to_hash.append(relpath)
+        if to_hash:
+            paths = [str(staging_path / relpath) for relpath in to_hash]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                md5s = pool.map(compute_md5, paths, chunksize=16)
+                for relpath, md5 in zip(to_hash, md5s):
+                    files[relpath]["md5"] = md5
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            files[_]["device"],
+                            files[_]["inode"],
+                            files[_]["size"],
+                            files[_]["mtime"],
+                            files[_]["md5"],
+                        )
+                        for _ in to_hash
+                    ],
+                )
+    finally:
+        conn.close()
+    return files
+
+
+def fetch_latest_checksums(client, project_id):
+    """
+    Return latest version of a project, and md5 checksums of its artifacts, by path
+    """
+    latest_version = None
+    checksums = {}
+    docs = client.search(f'_extra.project_id:"{project_id}"', latest=True)
+    for doc in docs:
+        latest_version = doc["_extra"]["version"]
+        info = get_artifact_info(doc)
+        checksums[info["path"]] = info["md5"]
+    return latest_version, checksums
+
+
+def find_unchanged_files(files, checksums):
+    """
+    Return files from staging `files` index (with md5 computed) which are identical
+    to the ones in the previous version, given its `checksums`. Metadata JSON files
+    aren't considered, they're always uploaded to be indexed with the new version.
+    """
+    return [
+        relpath
+        for relpath, info in files.items()
+        if not relpath.endswith(".json")
+        and checksums.get(relpath)
+        and checksums[relpath] == info["md5"]
+    ]
+
+
+def get_checkpoint_path(staging_path, url):
+    # same staging folder can be uploaded to different instances
+    key = f"{url}|{staging_path.resolve()}"
+    key = hashlib.sha1(key.encode()).hexdigest()
+    return pathlib.Path(get_config_directory(), "uploads", f"{key}.json")
+
+
+def load_checkpoint(staging_path, url):
+    try:
+        return json.load(open(get_checkpoint_path(staging_path, url)))
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint):
+    staging_path = pathlib.Path(checkpoint["staging_dir"])
+    path = get_checkpoint_path(staging_path, checkpoint["url"])
+    atomic_write(path, json.dumps(checkpoint))
+
+
+def delete_checkpoint(staging_path, url):
+    get_checkpoint_path(staging_path, url).unlink(missing_ok=True)
+
+
+def get_presigned_url_expiry(url):
+    """
+    Return expiration time (epoch) of a presigned URL, from its signature parameters
+    (X-Amz-Date and X-Amz-Expires, or Expires), None if unknown
+    """
+    query = urllib.parse.urlsplit(url).query
+    params = {k.lower(): v for k, v in urllib.parse.parse_qsl(query)}
+    try:
+        if "x-amz-date" in params and "x-amz-expires" in params:
+            signed_at = datetime.datetime.strptime(
+                params["x-amz-date"], "%Y%m%dT%H%M%SZ"
+            ).replace(tzinfo=datetime.timezone.utc)
+            return signed_at.timestamp() + int(params["x-amz-expires"])
+        if "expires" in params:
+            return int(params["expires"])
+    except ValueError:
+        pass
+    return None
+
+
+def validate_metadata(client, staging_path, filenames):
+    """
+    Validate JSON metadata files using the API validation endpoint (raising an
+    error if invalid), sending documents by batches
+    """
+    batch = []
+    batch_size = 0
+    for filename in filenames:
+        if not filename.endswith(".json"):
+            continue
+        size = os.path.getsize(staging_path / filename)
+        if batch and (
+            len(batch) >= VALIDATE_BATCH_DOCS or batch_size + size > VALIDATE_BATCH_SIZE
+        ):
+            client.request("post", client._url + "/schema/validate", json={"docs": batch})
+            batch = []
+            batch_size = 0
+        batch.append(json.load(open(staging_path / filename)))
+        batch_size += size
+    if batch:
+        client.request("post", client._url + "/schema/validate", json={"docs": batch})
+
+
+def init_upload(client, filenames, project_id, version, expires_in, completed_by):
+    """
+    Start an upload session, returning presigned URLs for each file to upload,
+    along with completion and abort URLs.
+    """
+    if project_id and version:
+        endpoint = f"/projects/{project_id}/version/{version}/upload"
+    elif project_id:
+        endpoint = f"/projects/{project_id}/upload"
+    else:
+        endpoint = "/projects/upload"
+    body = {"filenames": filenames}
+    if expires_in:
+        body["expires_in"] = expires_in
+    if completed_by:
+        body["completed_by"] = completed_by
+    res = client.request("post", client._url + endpoint, json=body)
+    return res.json()
+
+
+def is_same_file(sent, info):
+    return (
+        sent is not None
+        and info is not None
+        and sent["size"] == info["size"]
+        and sent["mtime"] == info["mtime"]
+    )
+
+
+def put_file(session, url, path, md5=None):
+    # checksum verified by the storage on reception
+    headers = {"Content-MD5": base64.b64encode(bytes.fromhex(md5)).decode()} if md5 else {}
+    with open(path, "rb") as fin:
+        # empty file objects would be sent with chunked encoding, which S3 rejects
+        data = fin if os.path.getsize(path) else b""
+        res = session.put(url, data=data, headers=headers, timeout=STORAGE_TIMEOUT)
+    if res.status_code == 403:
+        raise PresignedURLRejected(url)
+    res.raise_for_status()
+
+
+def run_upload_pipeline(staging_path, files, to_send, urls, jobs, on_sent):
+    """
+    Upload `to_send` files through a 2-stage pipeline: one thread prepares files
+    (md5 checksum, taken from `files` index if already computed), while `jobs`
+    threads send prepared files to their presigned `urls`, reusing connections.
+    Stages are connected by a bounded queue, so preparation stays just ahead
+    of transfers and memory usage doesn't depend on the number of files.
+    `on_sent(filename)` is called from the calling thread as files are uploaded.
+    """
+    prepared = queue.Queue(maxsize=2 * jobs)
+    results = queue.Queue()
+    stop = threading.Event()
+    session = requests.Session()
+
+    def prepare():
+        try:
+            for filename in to_send:
+                if stop.is_set():
+                    break
+                md5 = files[filename].get("md5") or compute_md5(staging_path / filename)
+                prepared.put((filename, md5))
+        except BaseException as exc:
+            results.put((None, exc))
+        finally:
+            for _ in range(jobs):
+                prepared.put(None)  # one end marker per transfer thread
+
+    def transfer():
+        while True:
+            item = prepared.get()
+            if item is None:
+                return
+            if stop.is_set():
+                continue  # drain queue so prepare() isn't blocked
+            filename, md5 = item
+            try:
+                call_with_retry(
+                    put_file,
+                    session,
+                    urls[filename],
+                    staging_path / filename,
+                    md5=md5,
+                    retries=2,
+                    no_retry_on=(PresignedURLRejected,),
+                )
+                results.put((filename, None))
+            except BaseException as exc:
+                results.put((filename, exc))
+
+    threads = [threading.Thread(target=prepare, daemon=True)]
+    threads.extend(threading.Thread(target=transfer, daemon=True) for _ in range(jobs))
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(len(to_send)):
+            filename, exc = results.get()
+            if exc:
+                raise exc
+            on_sent(filename)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def upload_presigned(
+    client,
+    staging_path,
+    files,
+    permissions,
+    project_id=None,
+    version=None,
+    expires_in=None,
+    completed_by=None,
+    validate=True,
+    jobs=None,
+    resume=False,
+    unchanged=(),
+    verbose=False,
+):
+    """
+    Upload staging folder content (`files` index, see scan_staging_dir()) using presigned
+    URLs, keeping track of what was sent in a local checkpoint so an interrupted upload
+    can be resumed (`resume=True`), sending only the files missing. Files listed in
+    `unchanged` are declared with their md5 checksum, letting the instance link them to
+    the previous version instead of uploading them again. Return job status, project ID,
+    version, and the list of files transferred.
+    """
+    checkpoint = load_checkpoint(staging_path, client._url)
+    if resume:
+        if not checkpoint:
+            raise InvalidArgument(f"No interrupted upload to resume for {staging_path}")
+        if (project_id and project_id != checkpoint["project_id"]) or (
+            version and version != checkpoint["version"]
+        ):
+            raise InvalidArgument(
+                "Interrupted upload was for "
+                + f"{checkpoint['project_id']}@{checkpoint['version']}, can't resume"
+            )
+        unknowns = set(files).difference(checkpoint["presigned_urls"])
+        unknowns.difference_update(checkpoint["links"])
+        if unknowns:
+            raise InvalidArgument(
+                f"Files added to staging folder since the upload started: {sorted(unknowns)}"
+            )
+        print(
+            f":repeat: Resuming upload to {checkpoint['project_id']}@{checkpoint['version']}"
+        )
+    else:
+        if checkpoint:
+            print(
+                f"[orange3]Found an interrupted upload for {staging_path}, use --resume to "
+                + "continue it, or --abort to cancel it[/orange3]"
+            )
+            raise Abort()
+        if validate:
+            validate_metadata(client, staging_path, files)
+        unchanged = set(unchanged)
+        filenames = [
+            {
+                "check": "md5",
+                "filename": relpath,
+                "value": {"field": "md5sum", "md5sum": files[relpath]["md5"]},
+            }
+            if relpath in unchanged
+            else relpath
+            for relpath in files
+        ]
+        start = time.monotonic()
+        init = init_upload(
+            client, filenames, project_id, version, expires_in, completed_by
+        )
+        if verbose:
+            print(
+                f":key: {len(init.get('presigned_urls', []))} presigned URLs obtained "
+                + f"in {time.monotonic() - start:.1f}s"
+            )
+        expiries = [
+            get_presigned_url_expiry(_["url"]) for _ in init.get("presigned_urls", [])
+        ]
+        checkpoint = {
+            "url": client._url,
+            "staging_dir": str(staging_path.resolve()),
+            "project_id": init["project_id"],
+            "version": init["version"],
+            "presigned_urls": {
+                _["filename"]: _["url"] for _ in init.get("presigned_urls", [])
+            },
+            "links": [_["filename"] for _ in init.get("links", [])],
+            "completion_url": init["completion_url"],
+            "abort_url": init["abort_url"],
+            "created_at": datetime.datetime.now().isoformat(),
+            "expires_at": min(filter(None, expiries), default=None),
+            "sent": {},
+        }
+        save_checkpoint(checkpoint)
+
+    target = f"{checkpoint['project_id']}@{checkpoint['version']}"
+    abort_msg = f"use --abort to cancel the upload to {target}, then upload again"
+    removed = [
+        filename
+        for filename in checkpoint["presigned_urls"]
+        if filename not in files and filename not in checkpoint["sent"]
+    ]
+    if removed:
+        raise InvalidArgument(
+            f"Files removed from staging folder since the upload started: {sorted(removed)}. "
+            + f"Restore them to resume, or {abort_msg}"
+        )
+    # files to send, either never sent, or modified since
+    to_send = [
+        filename
+        for filename in checkpoint["presigned_urls"]
+        if filename in files
+        and not is_same_file(checkpoint["sent"].get(filename), files[filename])
+    ]
+    expires_at = checkpoint.get("expires_at")
+    if to_send and expires_at and time.time() > expires_at - PRESIGNED_URL_MARGIN:
+        expired_on = datetime.datetime.fromtimestamp(expires_at).isoformat(" ", "seconds")
+        raise InvalidArgument(
+            f"Presigned URLs expired on {expired_on}, {len(to_send)} files can't be sent: "
+            + abort_msg
+        )
+    if verbose and checkpoint["links"]:
+        print(
+            f":link: {len(checkpoint['links'])} unchanged files linked to previous version"
+        )
+    num_sent = 0
+
+    def on_sent(filename):
+        nonlocal num_sent
+        checkpoint["sent"][filename] = {
+            "size": files[filename]["size"],
+            "mtime": files[filename]["mtime"],
+        }
+        num_sent += 1
+        if verbose:
+            print(f":outbox_tray: [{num_sent}/{len(to_send)}] {filename}")
+        if num_sent % CHECKPOINT_EVERY == 0:
+            save_checkpoint(checkpoint)
+
+    try:
+        run_upload_pipeline(
+            staging_path,
+            files,
+            to_send,
+            checkpoint["presigned_urls"],
+            jobs or DEFAULT_UPLOAD_JOBS,
+            on_sent,
+        )
+    except PresignedURLRejected:
+        raise InvalidArgument(
+            "Presigned URL rejected by the storage (HTTP 403), most likely expired: "
+            + abort_msg
+        )
+    finally:
+        save_checkpoint(checkpoint)
+
+    res = client.request(
+        "put",
+        client._url + checkpoint["completion_url"],
+        json=json.loads(permissions.json()),
+    )
+    delete_checkpoint(staging_path, client._url)
+    print("Upload completed.")
+    return res.json(), checkpoint["project_id"], checkpoint["version"], to_send
+
+
+def abort_upload(client, staging_path):
+    checkpoint = load_checkpoint(staging_path, client._url)
+    if not checkpoint:
+        raise InvalidArgument(f"No interrupted upload to abort for {staging_path}")
+    client.request("put", client._url + checkpoint["abort_url"])
+    delete_checkpoint(staging_path, client._url)
+    print(
+        f":wastebasket: Upload to {checkpoint['project_id']}@{checkpoint['version']} aborted"
+    )
+
+
+def validate_metadata_locally(json_files, verbose=False):
+    """
+    Validate metadata `json_files` locally, before any transfer, exiting with an
+    error if any of them is invalid
+    """
+    errors, unvalidated = validate_documents_locally(json_files)
+    if errors:
+        report_validation_errors(errors)
+        raise Exit(1)
+    if verbose:
+        print(
+            f":white_check_mark: {len(json_files) - len(unvalidated)} metadata "
+            + "files validated"
+        )
+    if unvalidated:
+        print(
+            f"[bright_black]{len(unvalidated)} metadata file(s) with schemas not "
+            + "resolvable locally, left to API validation[/bright_black]"
+        )
+
+
+def get_transfer_kwargs(client, **kwargs):
+    """
+    Return transfer parameters (not None) for the client's upload_project(). Raise
+    BadParameter for the ones it doesn't declare explicitly (see TRANSFER_OPTIONS),
+    rather than letting the upload go on without honouring them.
+    """
+    params = inspect.signature(client.upload_project).parameters
+    supported = {}
+    for key, value in kwargs.items():
+        if value is None:
+            continue
+        if key not in params:
+            raise BadParameter(
+                "not supported by the installed artifactdb-client version "
+                + f"(no {key!r} transfer parameter)",
+                param_hint=f"'{TRANSFER_OPTIONS[key]}'",
+            )
+        supported[key] = value
+    return supported
+
+
+def get_default_owners(client):
+    """
+    Return the authenticated user or service account, as the default owner
+    """
+    try:
+        claims = jose.jwt.get_unverified_claims(
+            client._auth._get_token_data().access_token
+        )
+        return claims["preferred_username"]
+    except Exception as e:
+        print(f"[red]Unable to find an `owner` from current context: [white]{e}")
+
+
+def build_permissions(owners, viewers, read_access, write_access):
+    if isinstance(owners, str):
+        owners = list(map(str.strip, owners.split(",")))
+    if isinstance(viewers, str):
+        viewers = list(map(str.strip, viewers.split(",")))
+    return PermissionsInfo(
+        owners=owners,
+        viewers=viewers,
+        read_access=read_access,
+        write_access=write_access,
+    )
+
+
+def parse_expiration(expires_in, completed_by):
+    """
+    Check expiration dates can be parsed, returning `completed_by` (set to
+    `expires_in` if the artifacts expire within a day) and a message describing
+    the expiration, if any.
+    """
+    expire_msg = None
+    if completed_by:
+        parsed = dateparser.parse(completed_by)
+        if not parsed:
+            raise InvalidArgument(f"Couldn't parse date {completed_by}")
+    if expires_in:
+        parsed = dateparser.parse(expires_in)
+        if not parsed:
+            raise InvalidArgument(f"Couldn't parse date {expires_in}")
+        if parsed - datetime.datetime.now() < datetime.timedelta(days=1):
+            completed_by = expires_in
+        expire_msg = f":hourglass_flowing_sand: Expiring {expires_in!r} ('{parsed}')"
+    return completed_by, expire_msg
+
+
+def load_batch_manifest(manifest):
+    """
+    Load batch upload manifest, a CSV file with a header, or a YAML file with a list
+    of entries. Each entry describes one upload, with at least `staging_dir` (relative
+    to the manifest's folder), and optionally any of BATCH_FIELDS. Empty values are
+    considered not set.
+    """
+    manifest_path = pathlib.Path(manifest).expanduser()
+    with open(manifest_path, newline="") as fin:
+        if manifest_path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(fin))
+        elif manifest_path.suffix.lower() in (".yaml", ".yml"):
+            rows = yaml.load(fin, Loader=YamlLoader) or []
+        else:
+            raise InvalidArgument(
+                f"Unsupported batch manifest {manifest!r}, expecting a .csv or .yaml file"
+            )
+    if not isinstance(rows, list):
+        raise InvalidArgument("Batch manifest must contain a list of uploads")
+    entries = []
+    for num, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise InvalidArgument(f"Batch manifest, entry #{num}: expecting a mapping")
+        row = {key: value for key, value in row.items() if value not in (None, "")}
+        unknowns = set(row).difference(BATCH_FIELDS)
+        if unknowns:
+            raise InvalidArgument(
+                f"Batch manifest, entry #{num}: unknown field(s) {sorted(unknowns)}"
+            )
+        if not "staging_dir" in row:
+            raise InvalidArgument(f"Batch manifest, entry #{num}: missing `staging_dir`")
+        if "version" in row and not "project_id" in row:
+            raise InvalidArgument(
+                f"Batch manifest, entry #{num}: `version` requires `project_id`"
+            )
+        for field in ("read_access", "write_access"):
+            if field in row and row[field] not in [_.value for _ in ROLE_ACCESS]:
+                raise InvalidArgument(
+                    f"Batch manifest, entry #{num}: invalid {field} {row[field]!r}"
+                )
+        row["staging_dir"] = manifest_path.parent / pathlib.Path(
+            row["staging_dir"]
+        ).expanduser()
+        # versions/IDs could be parsed as numbers from YAML
+        for field in ("project_id", "version"):
+            if field in row:
+                row[field] = str(row[field])
+        entries.append(row)
+    return entries
+
+
+def upload_batch_entry(
+    client,
+    entry,
+    defaults,
+    upload_mode,
+    validate,
+    transfer_kwargs,
+    jobs=None,
+    staging_index=None,
+):
+    """
+    Upload one entry of a batch manifest, options not set in the entry taken
+    from `defaults`. With `presigned` upload mode and `jobs`, files are sent by
+    upload_presigned(). The staging folder is scanned unless its `staging_index`
+    is given. Return upload status, project ID, version, number of files and
+    total size.
+    """
+    params = dict(defaults, **entry)
+    staging_path = params["staging_dir"]
+    if not staging_path.is_dir():
+        raise InvalidArgument(f"Staging folder {str(staging_path)!r} doesn't exist")
+    completed_by, _ = parse_expiration(params.get("expires_in"), params.get("completed_by"))
+    permissions = build_permissions(
+        params.get("owners"),
+        params.get("viewers"),
+        params["read_access"],
+        params["write_access"],
+    )
+    if staging_index is None:
+        staging_index = scan_staging_dir(staging_path)
+    if upload_mode == UPLOAD_MODES.presigned.value and jobs:
+        status, project_id, version, _ = upload_presigned(
+            client,
+            staging_path,
+            staging_index,
+            permissions,
+            project_id=params.get("project_id"),
+            version=params.get("version"),
+            expires_in=params.get("expires_in"),
+            completed_by=completed_by,
+            validate=validate,
+            jobs=jobs,
+        )
+    else:
+        status, project_id, version = client.upload_project(
+            staging_dir=staging_path.as_posix(),
+            permissions_info=permissions,
+            upload_mode=upload_mode,
+            project_id=params.get("project_id"),
+            version=params.get("version"),
+            expires_in=params.get("expires_in"),
+            validate=validate,
+            completed_by=completed_by,
+            **transfer_kwargs,
+        )
+    if not isinstance(status, dict):
+        status = status.dict()
+    total_size = sum(_["size"] for _ in staging_index.values())
+    return status, project_id, version, len(staging_index), total_size
+
+
+def upload_batch(
+    client,
+    entries,
+    defaults,
+    upload_mode,
+    validate,
+    transfer_kwargs,
+    batch_jobs,
+    jobs=None,
+    indexes=None,
+):
+    """
+    Upload all batch manifest `entries` concurrently, using `batch_jobs` threads
+    sharing the same client (and token), reusing staging folders already scanned
+    (`indexes`, per staging folder). Return a list of results, in the manifest's
+    order, either a (status, project_id, version, num_files, size, elapsed) tuple,
+    or the exception raised.
+    """
+    indexes = indexes or {}
+
+    def run(entry):
+        start = time.monotonic()
+        result = upload_batch_entry(
+            client,
+            entry,
+            defaults,
+            upload_mode,
+            validate,
+            transfer_kwargs,
+            jobs,
+            indexes.get(entry["staging_dir"]),
+        )
+        return result + (time.monotonic() - start,)
+
+    results = [None] * len(entries)
+    with ThreadPoolExecutor(max_workers=batch_jobs) as pool:
+        futures = {pool.submit(run, entry): idx for idx, entry in enumerate(entries)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            staging_dir = entries[idx]["staging_dir"]
+            try:
+                results[idx] = future.result()
+                print(f":white_check_mark: {staging_dir}")
+            except Exception as exc:
+                results[idx] = exc
+                print(f":x: [red]{staging_dir}[/red]: {exc}")
+    return results
+
+
+def build_batch_table(entries, results):
+    table = Table(title="Batch upload")
+    table.add_column("Staging folder")
+    table.add_column("Project")
+    table.add_column("Files", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Job")
+    for entry, result in zip(entries, results):
+        if isinstance(result, Exception):
+            table.add_row(
+                str(entry["staging_dir"]), "", "", "", "", f"[red]{result}[/red]"
+            )
+            continue
+        status, project_id, version, num_files, total_size, elapsed = result
+        table.add_row(
+            str(entry["staging_dir"]),
+            f"{project_id}@{version}",
+            str(num_files),
+            format_size(total_size),
+            f"{elapsed:.1f}s",
+            f"[green]{status.get('status')}[/green] {status.get('job_id')}",
+        )
+    return table
+
+
+def run_batch_upload(
+    client,
+    manifest,
+    defaults,
+    mode,
+    validate,
+    local_validation,
+    jobs,
+    part_size,
+    part_concurrency,
+    batch_jobs,
+    upload_msg,
+    verbose,
+    confirm,
+):
+    """
+    Upload staging folders listed in batch `manifest`, register all resulting jobs
+    and print a summary table. Metadata files of all the staging folders are
+    validated locally at once, before any transfer. Exit with an error if any of
+    the uploads failed.
+    """
+    entries = load_batch_manifest(manifest)
+    if (part_size or part_concurrency) and not mode.startswith("sts:"):
+        raise InvalidArgument(
+            "Options --part-size and --part-concurrency require a `sts:*` upload mode"
+        )
+    transfer_kwargs = {}
+    if mode != UPLOAD_MODES.presigned.value:
+        # --jobs is handled by upload_presigned() in `presigned` mode
+        transfer_kwargs = get_transfer_kwargs(
+            client,
+            max_workers=jobs,
+            multipart_chunksize=part_size and part_size * 1024 * 1024,
+            max_concurrency=part_concurrency,
+        )
+    indexes = {}
+    if validate and local_validation:
+        if local_validation_available():
+            json_files = []
+            for entry in entries:
+                staging_path = entry["staging_dir"]
+                # missing staging folders are reported by their own upload
+                if staging_path.is_dir():
+                    indexes[staging_path] = scan_staging_dir(staging_path)
+                    json_files.extend(
+                        staging_path / _
+                        for _ in indexes[staging_path]
+                        if _.endswith(".json")
+                    )
+            validate_metadata_locally(json_files, verbose)
+        elif verbose:
+            print(
+                "[bright_black]Local validation skipped, `jsonschema` not installed"
+                + "[/bright_black]"
+            )
+    if verbose:
+        print("[bold underline]Summary[/bold underline]")
+        print(
+            f":sparkles: Uploading [blue]{len(entries)}[/blue] staging folders from "
+            + f"manifest {manifest}, {batch_jobs} at a time"
+        )
+        print(upload_msg)
+    if confirm:
+        ok = Confirm.ask(
+            f"❓ Proceed?",
+            default=False,
+        )
+        if not ok:
+            raise Abort()
+    start = time.monotonic()
+    results = upload_batch(
+        client,
+        entries,
+        defaults,
+        mode,
+        validate,
+        transfer_kwargs,
+        batch_jobs,
+        jobs,
+        indexes,
+    )
+    elapsed = time.monotonic() - start
+    uploaded = [_ for _ in results if not isinstance(_, Exception)]
+    # save all job URLs in current context, at once
+    register_jobs([(pid, ver, status) for status, pid, ver, *_ in uploaded])
+    Console().print(build_batch_table(entries, results))
+    num_files = sum(_[3] for _ in uploaded)
+    total_size = sum(_[4] for _ in uploaded)
+    print(
+        f":stopwatch:  Uploaded {len(uploaded)}/{len(entries)} staging folders, "
+        + f"{num_files} files ({format_size(total_size)}) in {elapsed:.1f}s, "
+        + f"{format_size(total_size / elapsed if elapsed else total_size)}/s"
+    )
+    if len(uploaded) != len(entries):
+        raise Exit(1)
+
+
 ############
 # COMMANDS #
 ############
@@ -47,8 +966,9 @@ UPLOAD_MODES = enum.Enum(
 
 def upload_command(
     staging_dir: str = Argument(
-        ...,
-        help="Path to folder containing the files to upload",
+        None,
+        help="Path to folder containing the files to upload (not used with --batch)",
+        show_default=False,
     ),
     project_id: str = Option(
         None,
@@ -112,6 +1032,66 @@ def upload_command(
         True,
         help="Validate metadata JSON files, using the $schema field and API validation endpoint",
     ),
+    local_validation: bool = Option(
+        True,
+        help="Requires --validate. Before any transfer, validate metadata JSON files locally "
+        + "against their schemas, in parallel (requires `jsonschema` package, skipped otherwise)",
+    ),
+    jobs: int = Option(
+        None,
+        help="Number of files uploaded in parallel (default depends on the upload mode). "
+        + "With `presigned` upload mode, files are then sent by the CLI itself, as with "
+        + "--resumable.",
+        min=1,
+    ),
+    part_size: int = Option(
+        None,
+        help="Only for `sts:*` upload modes. Size of the parts, in MiB, when uploading large "
+        + "files using multipart uploads. Files bigger than that are split into parts.",
+        min=5,
+    ),
+    part_concurrency: int = Option(
+        None,
+        help="Only for `sts:*` upload modes. Number of parts uploaded in parallel for a given file",
+        min=1,
+    ),
+    resumable: bool = Option(
+        False,
+        help="Only for `presigned` upload mode. Keep track of uploaded files in a local "
+        + "checkpoint, so the upload can be continued with --resume if interrupted.",
+    ),
+    resume: bool = Option(
+        False,
+        help="Resume an interrupted --resumable upload of the staging folder, sending only "
+        + "the files missing",
+    ),
+    abort: bool = Option(
+        False,
+        help="Abort an interrupted --resumable upload of the staging folder, and discard its checkpoint",
+    ),
+    skip_unchanged: bool = Option(
+        False,
+        help="Requires --project-id. Compare files with the latest version of the project "
+        + "(md5 checksums), and let the instance link unchanged files instead of uploading "
+        + "them again. Implies --resumable.",
+    ),
+    diff: bool = Option(
+        False,
+        help="Requires --project-id. Report files unchanged compared to the latest version "
+        + "of the project (md5 checksums).",
+    ),
+    batch: str = Option(
+        None,
+        help="Upload several staging folders, listed in a manifest file (CSV with a header, "
+        + "or YAML list), one upload per row, with fields `staging_dir`, `project_id`, "
+        + "`version`, `owners`, `viewers`, `read_access`, `write_access`, `expires_in` "
+        + "and `completed_by`. Fields not set in a row default to the command's options.",
+    ),
+    batch_jobs: int = Option(
+        DEFAULT_BATCH_JOBS,
+        help="Requires --batch. Number of staging folders uploaded concurrently",
+        min=1,
+    ),
     verbose: bool = Option(
         False,
         help="Print information about what the command is performing",
@@ -124,51 +1104,121 @@ def upload_command(
     """
     Upload artifacts.
     """
-    client = get_contextual_client()
-    try:
-        if not owners:
-            claims = jose.jwt.get_unverified_claims(
-                client._auth._get_token_data().access_token
+    if batch:
+        if staging_dir or project_id or version:
+            raise InvalidArgument(
+                "With --batch, staging folders, projects and versions are set in the manifest"
             )
-            owners = claims["preferred_username"]
-    except Exception as e:
-        print(f"[red]Unable to find an `owner` from current context: [white]{e}")
-    if isinstance(owners, str):
-        owners = list(map(str.strip, owners.split(",")))
-    if isinstance(viewers, str):
-        viewers = list(map(str.strip, viewers.split(",")))
-    permissions = PermissionsInfo(
-        owners=owners,
-        viewers=viewers,
-        read_access=read_access.value,
-        write_access=write_access.value,
-    )
-    staging_path = pathlib.Path(staging_dir).expanduser()
+        if resumable or resume or abort or skip_unchanged or diff:
+            raise InvalidArgument(
+                "Option --batch can't be used with resumable uploads, --skip-unchanged or --diff"
+            )
+    elif not staging_dir:
+        raise click.MissingParameter(
+            ctx=click.get_current_context(silent=True),
+            param_type="argument",
+            param_hint="'STAGING_DIR'",
+        )
+    client = get_contextual_client()
+    if abort:
+        abort_upload(client, pathlib.Path(staging_dir).expanduser())
+        return
+    if not owners:
+        owners = get_default_owners(client)
     mode = upload_mode.value
-    sts_impl = None
-    upload_msg = None
-    expire_msg = None
-
     upload_msg = f":rocket: Using [bright_black]{mode}[/bright_black] upload mode"
 
-    if completed_by:
-        parsed = dateparser.parse(completed_by)
-        if not parsed:
-            raise InvalidArgument(f"Couldn't parse date {completed_by}")
+    if batch:
+        run_batch_upload(
+            client,
+            batch,
+            {
+                "owners": owners,
+                "viewers": viewers,
+                "read_access": read_access.value,
+                "write_access": write_access.value,
+                "expires_in": expires_in,
+                "completed_by": completed_by,
+            },
+            mode,
+            validate,
+            local_validation,
+            jobs,
+            part_size,
+            part_concurrency,
+            batch_jobs,
+            upload_msg,
+            verbose,
+            confirm,
+        )
+        return
 
-    if expires_in:
-        parsed = dateparser.parse(expires_in)
-        if not parsed:
-            raise InvalidArgument(f"Couldn't parse date {expires_in}")
-        if parsed - datetime.datetime.now() < datetime.timedelta(days=1):
-            completed_by = expires_in
-        expire_msg = f":hourglass_flowing_sand: Expiring {expires_in!r} ('{parsed}')"
+    completed_by, expire_msg = parse_expiration(expires_in, completed_by)
+    staging_path = pathlib.Path(staging_dir).expanduser()
+    if not staging_path.is_dir():
+        print(f"[red]Staging folder {str(staging_path)!r} doesn't exist[/red]")
+        raise Abort()
+    permissions = build_permissions(
+        owners, viewers, read_access.value, write_access.value
+    )
+
+    resumable = resumable or resume or skip_unchanged
+    if (skip_unchanged or diff) and not project_id:
+        raise InvalidArgument("Options --skip-unchanged and --diff require --project-id")
+    if resumable and mode != UPLOAD_MODES.presigned.value:
+        raise InvalidArgument("Resumable uploads require `presigned` upload mode")
+    if (part_size or part_concurrency) and not mode.startswith("sts:"):
+        raise InvalidArgument(
+            "Options --part-size and --part-concurrency require a `sts:*` upload mode"
+        )
+    # with presigned URLs, --jobs is honoured by the CLI's own transfer path
+    resumable = resumable or (jobs is not None and mode == UPLOAD_MODES.presigned.value)
+    if not resumable:
+        transfer_kwargs = get_transfer_kwargs(
+            client,
+            max_workers=jobs,
+            multipart_chunksize=part_size and part_size * 1024 * 1024,
+            max_concurrency=part_concurrency,
+        )
 
+    validate_locally = validate and local_validation and not resume
+    if validate_locally and not local_validation_available():
+        validate_locally = False
+        if verbose:
+            print(
+                "[bright_black]Local validation skipped, `jsonschema` not installed"
+                + "[/bright_black]"
+            )
+    # staging folder is walked once, and only if needed, the index is then used for
+    # all the steps. Otherwise, upload_project() walks the folder itself.
+    staging_index = None
+    if resumable or skip_unchanged or diff or validate_locally or verbose:
+        staging_index = scan_staging_dir(staging_path)
+        num_files = len(staging_index)
+        total_size = sum(_["size"] for _ in staging_index.values())
+    if validate_locally:
+        validate_metadata_locally(
+            [staging_path / _ for _ in staging_index if _.endswith(".json")], verbose
+        )
+
+    unchanged = []
+    if (skip_unchanged or diff) and not resume:
+        hash_staging_files(staging_path, staging_index)
+        latest_version, checksums = fetch_latest_checksums(client, project_id)
+        unchanged = find_unchanged_files(staging_index, checksums)
+        unchanged_size = sum(staging_index[_]["size"] for _ in unchanged)
+        print(
+            f":mag: [blue]{len(unchanged)}[/blue] files ({format_size(unchanged_size)}) "
+            + f"unchanged since version {latest_version!r}"
+        )
+        if verbose:
+            for relpath in unchanged:
+                print(f"  [bright_black]{relpath}[/bright_black]")
     if verbose:
-        num_files = len([_ for _ in staging_path.rglob("*") if _.is_file()])
         print("[bold underline]Summary[/bold underline]")
         print(
-            f":sparkles: Uploading [blue]{num_files}[/blue] files from folder {staging_path}"
+            f":sparkles: Uploading [blue]{num_files}[/blue] files ({format_size(total_size)}) "
+            + f"from folder {staging_path}"
         )
 
         if project_id:
@@ -198,18 +1248,60 @@ def upload_command(
         if not ok:
             raise Abort()
     # let's go...
-    status, project_id, version = client.upload_project(
-        staging_dir=staging_path.as_posix(),
-        permissions_info=permissions,
-        upload_mode=mode,
-        project_id=project_id,
-        version=version,
-        expires_in=expires_in,
-        validate=validate,
-        completed_by=completed_by,
-    )
+    start = time.monotonic()
+    sent = None
+    if resumable:
+        status, project_id, version, sent = upload_presigned(
+            client,
+            staging_path,
+            staging_index,
+            permissions,
+            project_id=project_id,
+            version=version,
+            expires_in=expires_in,
+            completed_by=completed_by,
+            validate=validate,
+            jobs=jobs,
+            resume=resume,
+            unchanged=unchanged if skip_unchanged else (),
+            verbose=verbose,
+        )
+    else:
+        status, project_id, version = client.upload_project(
+            staging_dir=staging_path.as_posix(),
+            permissions_info=permissions,
+            upload_mode=mode,
+            project_id=project_id,
+            version=version,
+            expires_in=expires_in,
+            validate=validate,
+            completed_by=completed_by,
+            **transfer_kwargs,
+        )
+    elapsed = time.monotonic() - start
+    if staging_index is None:
+        # staging folder walked by upload_project() only, sizes not known here
+        print(f":stopwatch:  Uploaded in {elapsed:.1f}s")
+    else:
+        if sent is None:
+            sent = list(staging_index)
+        # only files actually transferred count, not the ones linked or already sent
+        sent_size = sum(staging_index[_]["size"] for _ in sent)
+        print(
+            f":stopwatch:  Uploaded {len(sent)} files ({format_size(sent_size)}) "
+            + f"in {elapsed:.1f}s, "
+            + f"{format_size(sent_size / elapsed if elapsed else sent_size)}/s"
+            + (
+                f", {num_files - len(sent)} files skipped"
+                if len(sent) != num_files
+                else ""
+            )
+        )
 
     # save job URL in current context to easily check after
-    register_job(project_id, version, status.dict())
+    if not isinstance(status, dict):
+        status = status.dict()
+    register_job(project_id, version, status)
     print(f":gear: Job created for project {project_id}@{version}:")
     print(status)
+
@@ -3,7 +3,20 @@ from rich.console import Console
 
 
 class BaseFormatter(metaclass=ABCMeta):
+    # machine-readable formatters write raw data, results aren't paginated
+    # and informational messages go to stderr
+    MACHINE_READABLE = False
+    # set by commands before formatting results: requested fields (dot-notation),
+    # and number of results per batch, for formatters writing results by batches
+    fields = None
+    batch_size = None
+
     def format_result(self, result: dict, console: Console):
         """
         Format the dict result and print it using console.
         """
+
+    def close(self, console: Console):
+        """
+        Called once all results were formatted, to flush any pending output.
+        """
@@ -12,6 +12,10 @@ class YamlFormatter(BaseFormatter):
 
     def format_result(self, result: dict, console: Console):
         dumped = yaml.dump(result)
+        if not console.is_terminal:
+            # no highlighting when piped, skip rendering altogether
+            console.file.write(dumped + "---\n")
+            return
         console.print(Syntax(dumped, "yaml"))
         console.print("---")
 
@@ -21,4 +25,7 @@ class JsonFormatter(BaseFormatter):
 
     def format_result(self, result: dict, console: Console):
         dumped = json.dumps(result, indent=2)
+        if not console.is_terminal:
+            console.file.write(dumped + "\n")
+            return
         console.print(Syntax(dumped, "json"))
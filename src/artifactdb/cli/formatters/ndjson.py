@@ -0,0 +1,41 @@
+import sys
+import json
+
+from rich.console import Console
+
+try:
+    import orjson
+except ImportError:
+    # optional, faster JSON encoding
+    orjson = None
+
+from . import BaseFormatter
+
+
+def dumps(result):
+    if orjson is not None:
+        return orjson.dumps(result)
+    return json.dumps(result, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class NdjsonFormatter(BaseFormatter):
+    """
+    One compact JSON document per line, written directly to stdout (buffered),
+    without any rendering
+    """
+
+    NAME = "ndjson"
+    MACHINE_READABLE = True
+
+    def __init__(self):
+        self.out = None
+
+    def format_result(self, result: dict, console: Console):
+        if self.out is None:
+            sys.stdout.flush()  # anything printed so far goes first
+            self.out = sys.stdout.buffer
+        self.out.write(dumps(result) + b"\n")
+
+    def close(self, console: Console):
+        if self.out is not None:
+            self.out.flush()
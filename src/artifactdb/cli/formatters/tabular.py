@@ -0,0 +1,237 @@
+import sys
+import csv
+import json
+from abc import abstractmethod
+
+from rich.console import Console
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # optional, required for Parquet and Arrow formats only
+    pyarrow = None
+
+from . import BaseFormatter
+from ..cliutils import InvalidArgument, get_field
+
+
+def flatten(doc, prefix=""):
+    """
+    Flatten nested dict `doc` into a dict with dot-notation keys,
+    eg. {"_extra": {"id": ...}} => {"_extra.id": ...}
+    """
+    flat = {}
+    for key, value in doc.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+
+class TabularFormatter(BaseFormatter):
+    """
+    Accumulate results into batches of rows, written incrementally. Columns are the
+    requested dot-notation fields, or the fields found in the first batch of results
+    (with a warning about fields found later on, ignored). Nested values (lists,
+    objects) are stored as JSON strings.
+    """
+
+    MACHINE_READABLE = True
+    DEFAULT_BATCH_SIZE = 10000
+
+    def __init__(self):
+        self.rows = []
+        self.columns = None
+        self.ignored = set()
+        self.messages = Console(stderr=True)
+
+    def format_result(self, result: dict, console: Console):
+        self.rows.append(result)
+        if len(self.rows) >= (self.batch_size or self.DEFAULT_BATCH_SIZE):
+            self.flush_batch()
+
+    def close(self, console: Console):
+        self.flush_batch()
+        self.finish()
+
+    def flush_batch(self):
+        if not self.rows:
+            return
+        if self.columns is None:
+            if self.fields:
+                self.columns = list(self.fields)
+            else:
+                columns = {}  # dict keeps columns in order of appearance
+                for doc in self.rows:
+                    columns.update(dict.fromkeys(flatten(doc)))
+                self.columns = list(columns)
+        elif not self.fields:
+            # columns are already written, fields found from now on can't be added
+            known = set(self.columns) | self.ignored
+            ignored = {}
+            for doc in self.rows:
+                ignored.update(dict.fromkeys(k for k in flatten(doc) if k not in known))
+            if ignored:
+                self.ignored.update(ignored)
+                self.messages.print(
+                    "[orange3]Fields not found in the first batch of results, ignored: "
+                    + f"{', '.join(ignored)}. Use --fields to select columns[/orange3]"
+                )
+        records = [
+            [self.convert(get_field(doc, column)) for column in self.columns]
+            for doc in self.rows
+        ]
+        self.rows = []
+        self.write_batch(records)
+
+    def convert(self, value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+    @abstractmethod
+    def write_batch(self, records):
+        """
+        Write a batch of records (lists of values, in the same order as columns)
+        """
+
+    def finish(self):
+        pass
+
+
+class CsvFormatter(TabularFormatter):
+    NAME = "csv"
+    DELIMITER = ","
+
+    def __init__(self):
+        super().__init__()
+        self.writer = None
+
+    def convert(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return json.dumps(value)
+        return super().convert(value)
+
+    def write_batch(self, records):
+        if self.writer is None:
+            self.writer = csv.writer(
+                sys.stdout, delimiter=self.DELIMITER, lineterminator="\n"
+            )
+            self.writer.writerow(self.columns)
+        self.writer.writerows(records)
+
+    def finish(self):
+        sys.stdout.flush()
+
+
+class TsvFormatter(CsvFormatter):
+    NAME = "tsv"
+    DELIMITER = "\t"
+
+
+class ArrowFormatter(TabularFormatter):
+    """
+    Arrow IPC file format, written to stdout as record batches
+    """
+
+    NAME = "arrow"
+
+    def __init__(self):
+        if pyarrow is None:
+            raise InvalidArgument(f"Format {self.NAME!r} requires `pyarrow` package")
+        super().__init__()
+        self.schema = None
+        self.writer = None
+
+    def open_writer(self, sink, schema):
+        return pyarrow.ipc.new_file(sink, schema)
+
+    def build_array(self, name, values, type=None):
+        """
+        Build an Arrow array from `values`, of given `type` (inferred if None). Columns
+        mixing integers and floats are floats, other mixed types are converted to
+        strings. Integer columns accept floats without fractional part. Values not
+        fitting the type of a column are never dropped, InvalidArgument is raised.
+        """
+        if type is not None and pyarrow.types.is_integer(type):
+            values = [
+                int(v) if isinstance(v, float) and v.is_integer() else v for v in values
+            ]
+        try:
+            return pyarrow.array(values, type=type)
+        except (pyarrow.ArrowException, TypeError, ValueError, OverflowError):
+            pass
+        if type is None or pyarrow.types.is_string(type):
+            return pyarrow.array(
+                [
+                    v if v is None or isinstance(v, str) else json.dumps(v)
+                    for v in values
+                ],
+                type=pyarrow.string(),
+            )
+        for value in values:
+            try:
+                pyarrow.scalar(value, type=type)
+            except (pyarrow.ArrowException, TypeError, ValueError, OverflowError):
+                break
+        raise InvalidArgument(
+            f"Column {name!r}, of type {type} according to the first batch of results, "
+            + f"can't hold value {value!r}. Use a larger --batch-size, for types to be "
+            + "inferred from more results, or --fields to select other columns"
+        )
+
+    def write_batch(self, records):
+        columns = list(zip(*records))
+        if self.schema is None:
+            # types inferred from the first batch, columns with only nulls so far
+            # are considered strings
+            arrays = [
+                self.build_array(name, values)
+                for name, values in zip(self.columns, columns)
+            ]
+            self.schema = pyarrow.schema(
+                [
+                    (
+                        name,
+                        pyarrow.string()
+                        if array.type == pyarrow.null()
+                        else array.type,
+                    )
+                    for name, array in zip(self.columns, arrays)
+                ]
+            )
+            sys.stdout.flush()
+            sink = pyarrow.PythonFile(sys.stdout.buffer, mode="w")
+            self.writer = self.open_writer(sink, self.schema)
+        try:
+            arrays = [
+                self.build_array(field.name, values, field.type)
+                for values, field in zip(columns, self.schema)
+            ]
+        except InvalidArgument:
+            # output isn't finalized, not to look like a complete file
+            self.writer = None
+            raise
+        self.writer.write_batch(pyarrow.record_batch(arrays, schema=self.schema))
+
+    def finish(self):
+        if self.writer is not None:
+            self.writer.close()
+        sys.stdout.buffer.flush()
+
+
+class ParquetFormatter(ArrowFormatter):
+    """
+    Parquet file, written to stdout, one row group per batch
+    """
+
+    NAME = "parquet"
+
+    def open_writer(self, sink, schema):
+        return pyarrow.parquet.ParquetWriter(sink, schema)
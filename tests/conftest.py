@@ -18,6 +18,7 @@ runner = CliRunner()
 
 
 cfg_path = f"{typer.get_app_dir('artifactdb-cli')}/config"
+jobs_db_path = f"{typer.get_app_dir('artifactdb-cli')}/jobs.db"
 files_to_upload = f"{os.environ['HOME']}/upload"
 
 
@@ -45,6 +46,9 @@ def create_base_context_manually():
 def clear_config_file():
     if os.path.exists(cfg_path):
         os.remove(cfg_path)
+    # recorded jobs are stored separately
+    if os.path.exists(jobs_db_path):
+        os.remove(jobs_db_path)
 
     with open(cfg_path, "w") as cfg_file:
         cfg_file.write(CONTEXT_DATA)
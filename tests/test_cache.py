@@ -0,0 +1,42 @@
+from typer.testing import CliRunner
+from artifactdb.cli.main import app
+
+runner = CliRunner()
+
+
+def test_adb_cache_option_help():
+    result = runner.invoke(app, ["cache", "--help"])
+    assert result.exit_code == 0
+    for command in ["stats", "prune", "config"]:
+        assert command in result.stdout
+
+
+def test_adb_cache_config(tmp_path, clear_config_file):
+    result = runner.invoke(
+        app, ["cache", "config", "--path", str(tmp_path), "--max-size", "1GiB"]
+    )
+    assert result.exit_code == 0
+    assert f"path: {tmp_path}" in result.stdout
+    assert "max-size: 1GiB" in result.stdout
+
+
+def test_adb_cache_config_invalid_size():
+    result = runner.invoke(app, ["cache", "config", "--max-size", "lots"])
+    assert result.exit_code == 1
+    assert "Invalid size 'lots'" in str(result.exception)
+
+
+def test_adb_cache_stats():
+    result = runner.invoke(app, ["cache", "stats"])
+    assert result.exit_code == 0
+    assert "objects" in result.stdout
+
+
+def test_adb_cache_prune_all(tmp_path, clear_config_file):
+    # never evict the user's actual cache
+    runner.invoke(app, ["cache", "config", "--path", str(tmp_path)])
+    result = runner.invoke(app, ["cache", "prune", "--all"])
+    assert result.exit_code == 0
+    assert "Evicted" in result.stdout
+    result = runner.invoke(app, ["cache", "stats"])
+    assert "0 objects" in result.stdout
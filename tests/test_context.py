@@ -1,5 +1,6 @@
 from typer.testing import CliRunner
 from artifactdb.cli.main import app
+from artifactdb.cli.cliutils import load_config, save_config, get_config_path
 
 runner = CliRunner()
 auth_url = "https://..."
@@ -184,3 +185,15 @@ def test_adb_context_show():
     assert f"url: {auth_url}" in result.stdout
     assert "name: olympus-api-1-uat" in result.stdout
     assert f"url: {olumpus_api1_url}" in result.stdout
+
+
+def test_config_saved_only_when_changed(clear_config_file):
+    cfg = load_config()
+    save_config(cfg)
+    mtime = get_config_path().stat().st_mtime_ns
+    # no change, file not rewritten
+    save_config(load_config())
+    assert get_config_path().stat().st_mtime_ns == mtime
+    # modifying the returned config doesn't affect the cached one
+    cfg["current-context"] = "somewhere-else"
+    assert load_config()["current-context"] == "olympus-api-1-uat"
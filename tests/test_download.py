@@ -1,5 +1,7 @@
 import os
 import time
+import tarfile
+import zipfile
 
 import pytest
 from typer.testing import CliRunner
@@ -28,6 +30,17 @@ def test_adb_download_option_help():
         "--no-verbose",
         "--overwrite",
         "--no-overwrite",
+        "--jobs",
+        "--retries",
+        "--resume",
+        "--stream",
+        "--chunk-size",
+        "--connections",
+        "--query",
+        "--include",
+        "--exclude",
+        "--archive",
+        "--output",
         "--help",
     ]
     for option in options:
@@ -67,16 +80,29 @@ def test_adb_download_project_dest_folder(upload_new_project):
     assert result.exit_code == 0
 
 
-def test_adb_download_project_only_projectid():
-    result = runner.invoke(app, ["download", "test-OLA000000001"])
-    assert result.exit_code == 1
-    assert "Download a project without a version number is not supported at the moment" in str(result.exception)
+def test_adb_download_project_only_projectid(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/downloads_cli_latest"
+    result = runner.invoke(app, ["download", "--overwrite", project_id, dest])
+    assert result.exit_code == 0
+    assert f"version: {project_version} (latest)" in result.stdout
+    assert os.path.exists(f"{dest}/{project_id}/{project_version}/test_file1.txt")
+
+
+def test_adb_download_project_version_latest(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/downloads_cli_latest"
+    result = runner.invoke(app, ["download", "--overwrite", f"{project_id}@latest", dest])
+    assert result.exit_code == 0
+    assert f"version: {project_version} (latest)" in result.stdout
 
 
-def test_adb_download_project_version_latest():
-    result = runner.invoke(app, ["download", "test-OLA000000001@latest"])
+def test_adb_download_latest_non_existing_project():
+    result = runner.invoke(app, ["download", "test-OLA989898989@latest"])
     assert result.exit_code == 1
-    assert "`latest` is not supported at the moment" in str(result.exception)
+    assert "Unable to find a version for project" in str(result.exception)
 
 
 def test_adb_download_one_artifact(upload_new_project):
@@ -126,7 +152,8 @@ def test_adb_download_specified_by_options_invalid(upload_new_project):
 
 
 @pytest.mark.parametrize("cache,controller", [("no-cache", "NoCacheController"),
-                                                  ("biocfilecache", "BiocFileCacheController")])
+                                                  ("biocfilecache", "BiocFileCacheController"),
+                                                  ("cas", "cache store")])
 def test_adb_download_project_cache_mode(upload_new_project, cache, controller):
     project_id = upload_new_project["project_id"]
     project_version = upload_new_project["project_version"]
@@ -167,3 +194,151 @@ def test_adb_download_project_verbose_mode(upload_new_project):
         ],
     )
     assert result.exit_code == 0
+
+
+def test_adb_download_project_parallel(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    result = runner.invoke(
+        app,
+        [
+            "download", "--jobs", "4", "--verbose", "--overwrite",
+            f"{project_id}@{project_version}",
+            f"{os.environ['HOME']}/downloads_cli",
+        ],
+    )
+    assert result.exit_code == 0
+    assert "Downloaded 3 artifact(s)" in result.stdout
+
+
+def test_adb_download_project_resume(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/downloads_cli_resume"
+    cmd = ["download", "--resume", "--verbose", f"{project_id}@{project_version}", dest]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert os.path.exists(f"{dest}/.{project_id}@{project_version}.manifest.json")
+    # second run, nothing left to download
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert "Downloaded 0 artifact(s), 3 already up-to-date" in result.stdout
+
+
+def test_adb_download_project_stream(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/downloads_cli_stream"
+    result = runner.invoke(
+        app,
+        [
+            "download", "--stream", "--chunk-size", "1", "--connections", "2", "--overwrite",
+            f"{project_id}@{project_version}", dest,
+        ],
+    )
+    assert result.exit_code == 0
+    assert os.path.exists(f"{dest}/{project_id}/{project_version}/test_file1.txt")
+
+
+def test_adb_download_stream_with_cache_invalid():
+    result = runner.invoke(
+        app,
+        ["download", "--stream", "--cache", "biocfilecache", "test-OLA000000566@1"],
+    )
+    assert result.exit_code == 1
+    assert "Option --stream can't be used with a cache mode" in str(result.exception)
+
+
+def test_adb_download_project_cas_cache(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    for dest in ("downloads_cli_cas1", "downloads_cli_cas2"):
+        dest = f"{os.environ['HOME']}/{dest}"
+        result = runner.invoke(
+            app,
+            ["download", "--cache", "cas", f"{project_id}@{project_version}", dest],
+        )
+        assert result.exit_code == 0
+        assert os.path.exists(f"{dest}/{project_id}/{project_version}/test_file1.txt")
+    result = runner.invoke(app, ["cache", "stats"])
+    assert result.exit_code == 0
+    assert "cache hits" in result.stdout
+    # materialized files don't share their content with the cache
+    path = f"{dest}/{project_id}/{project_version}/test_file1.txt"
+    original = open(path).read()
+    with open(path, "a") as fout:
+        fout.write("modified")
+    dest = f"{os.environ['HOME']}/downloads_cli_cas3"
+    result = runner.invoke(
+        app, ["download", "--cache", "cas", f"{project_id}@{project_version}", dest]
+    )
+    assert result.exit_code == 0
+    assert open(f"{dest}/{project_id}/{project_version}/test_file1.txt").read() == original
+
+
+def test_adb_download_project_include_exclude(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/downloads_cli_globs"
+    result = runner.invoke(
+        app,
+        [
+            "download", "--include", "*.txt", "--exclude", "test_file2.*", "--overwrite",
+            f"{project_id}@{project_version}", dest,
+        ],
+    )
+    assert result.exit_code == 0
+    assert os.path.exists(f"{dest}/{project_id}/{project_version}/test_file1.txt")
+    assert not os.path.exists(f"{dest}/{project_id}/{project_version}/test_file2.txt")
+
+
+def test_adb_download_query(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/downloads_cli_query"
+    result = runner.invoke(
+        app,
+        ["download", "--query", f'_extra.project_id:"{project_id}"', "--overwrite", dest],
+    )
+    assert result.exit_code == 0
+    assert os.path.exists(f"{dest}/{project_id}/{project_version}/test_file1.txt")
+
+
+def test_adb_download_query_project_version_as_dest():
+    # a project version is not mistaken for the destination folder
+    result = runner.invoke(app, ["download", "--query", "*", "test-OLA000000566@1"])
+    assert result.exit_code == 1
+    assert "looks like a project version" in str(result.exception)
+
+
+def test_adb_download_one_artifact_with_query_invalid():
+    result = runner.invoke(
+        app,
+        ["download", "--query", "*", "--id", "test-OLA000000566:file.txt@1"],
+    )
+    assert result.exit_code == 1
+    assert "can't be used to download one artifact" in str(result.exception)
+
+
+@pytest.mark.parametrize("archive,opener", [("tar", tarfile.open), ("zip", zipfile.ZipFile)])
+def test_adb_download_project_archive(upload_new_project, tmp_path, archive, opener):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    output = tmp_path / f"archive.{archive}"
+    result = runner.invoke(
+        app,
+        ["download", "--archive", archive, "-o", str(output), f"{project_id}@{project_version}"],
+    )
+    assert result.exit_code == 0
+    assert "Archived 3 artifact(s)" in result.stdout
+    with opener(output) as archive_file:
+        names = archive_file.getnames() if archive == "tar" else archive_file.namelist()
+    assert f"{project_id}/{project_version}/test_file1.txt" in names
+
+
+def test_adb_download_archive_one_artifact_invalid():
+    result = runner.invoke(
+        app, ["download", "--archive", "tar", "test-OLA000000566:file.txt@1"]
+    )
+    assert result.exit_code == 1
+    assert "Option --archive can't be used to download one artifact" in str(result.exception)
@@ -0,0 +1,68 @@
+from typer.testing import CliRunner
+from artifactdb.cli.main import app
+from artifactdb.cli.commands.index import QueryParser
+
+runner = CliRunner()
+
+
+def test_adb_index_option_help():
+    result = runner.invoke(app, ["index", "--help"])
+    assert result.exit_code == 0
+    for command in ["pull", "ls", "rm"]:
+        assert command in result.stdout
+
+
+def test_adb_index_query_parser():
+    assert QueryParser('path:(x OR y) -"some words"').parse() == (
+        "and",
+        [
+            ("or", [("match", "path", "x"), ("match", "path", "y")]),
+            ("not", ("match", None, "some words")),
+        ],
+    )
+    assert QueryParser("_extra.file_size:[1 TO *}").parse() == (
+        "range", "_extra.file_size", "1", None, True, False,
+    )
+    assert QueryParser("a AND _exists_:b").parse() == (
+        "and", [("match", None, "a"), ("exists", "b")],
+    )
+
+
+def test_adb_index_pull(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(app, ["index", "pull", project_id])
+    assert result.exit_code == 0
+    assert f"{project_id!r}: 3 new" in result.stdout
+    # incremental: versions already indexed aren't pulled again
+    result = runner.invoke(app, ["index", "pull", project_id])
+    assert result.exit_code == 0
+    assert f"{project_id!r}: 0 new, 0 updated, 0 unchanged" in result.stdout
+    result = runner.invoke(app, ["index", "pull", project_id, "--full"])
+    assert result.exit_code == 0
+    assert "3 unchanged, 0 removed" in result.stdout
+    result = runner.invoke(app, ["index", "ls"])
+    assert result.exit_code == 0
+    assert f"{project_id!r}: 3 document(s)" in result.stdout
+
+
+def test_adb_index_rm(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(app, ["index", "pull", f"{project_id}@1"])
+    assert result.exit_code == 0
+    result = runner.invoke(app, ["index", "rm", f"{project_id}@1"])
+    assert result.exit_code == 0
+    assert "Removed 3 document(s)" in result.stdout
+
+
+def test_adb_search_offline(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(app, ["index", "pull", f"_extra.project_id:{project_id}"])
+    assert result.exit_code == 0
+    result = runner.invoke(
+        app,
+        ["search", "--offline", "--all", f"_extra.project_id:{project_id} AND -path:test_file2.txt"],
+    )
+    assert result.exit_code == 0
+    assert "path: test_file1.txt" in result.stdout
+    assert "path: test_file2.txt" not in result.stdout
+    assert "No more results" in result.stdout
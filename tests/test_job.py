@@ -15,7 +15,7 @@ def test_adb_job_no_args():
 def test_adb_job_option_help():
     result = runner.invoke(app, ["job", "--help"])
     assert result.exit_code == 0
-    commands = ["check", "list"]
+    commands = ["check", "list", "wait"]
     for command in commands:
         assert command in result.stdout
 
@@ -31,7 +31,7 @@ def test_adb_job_list_option_help():
     result = runner.invoke(app, ["job", "list", "--help"])
     assert result.exit_code == 0
     assert "List all jobs recorded in current context, with last checked status." in result.stdout
-    options = ["--verbose", "--help"]
+    options = ["--verbose", "--status", "--help"]
     for option in options:
         assert option in result.stdout
 
@@ -69,11 +69,18 @@ def test_adb_job_list_verbose(upload_new_project):
     assert project_id in result.stdout
 
 
+def test_adb_job_list_status(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(app, ["job", "list", "--status", "purged"])
+    assert result.exit_code == 0
+    assert project_id not in result.stdout
+
+
 def test_adb_job_check_option_help():
     result = runner.invoke(app, ["job", "check", "--help"])
     assert result.exit_code == 0
     assert "job_id" in result.stdout
-    options = ["--format", "--prune", "--verbose", "--help"]
+    options = ["--format", "--prune", "--verbose", "--workers", "--rate-limit", "--help"]
     for option in options:
         assert option in result.stdout
 
@@ -120,6 +127,14 @@ def test_adb_job_check_with_job_id(upload_new_project):
 # def test_adb_job_check_option_format():
 #     result = runner.invoke(app, ["job", "check", "--format", "json"])
 
+def test_adb_job_check_concurrent(upload_new_version):
+    project_id = upload_new_version["project_id"]
+    result = runner.invoke(app, ["job", "check", "--workers", "4", "--rate-limit", "10"])
+    assert result.exit_code == 0
+    assert "Success" in result.stdout
+    assert project_id in result.stdout
+
+
 @pytest.mark.parametrize("status,should_be_pruned", [("terminated", True), ("success", True), ("failure", False),
                                                      ("pending", False), ("none", False), ("all", True),
                                                      ("purged", False)])
@@ -149,4 +164,39 @@ def test_adb_job_check_verbose(upload_new_project):
     assert "indexed_files" in result.stdout
     assert "project_id" in result.stdout
     assert "version" in result.stdout
-    assert project_id in result.stdout
\ No newline at end of file
+    assert project_id in result.stdout
+
+
+def test_adb_job_wait_option_help():
+    result = runner.invoke(app, ["job", "wait", "--help"])
+    assert result.exit_code == 0
+    assert "JOB_IDS" in result.stdout
+    options = [
+        "--timeout",
+        "--interval",
+        "--max-interval",
+        "--unknown-grace",
+        "--format",
+        "--prune",
+        "--help",
+    ]
+    for option in options:
+        assert option in result.stdout
+
+
+def test_adb_job_wait(upload_new_project):
+    job_id = upload_new_project["job_id"]
+    result = runner.invoke(app, ["job", "wait", job_id, "--timeout", "60"])
+    assert result.exit_code == 0
+    assert "Success" in result.stdout
+    assert "indexed_files" in result.stdout
+
+
+def test_adb_job_wait_unknown_job():
+    # no task behind this job ID, it's given up on after the grace period, not waited
+    # for forever, and reported with a distinct exit code
+    result = runner.invoke(
+        app, ["job", "wait", "not-a-real-job-id", "--unknown-grace", "2", "--timeout", "30"]
+    )
+    assert result.exit_code == 2
+    assert "1 job(s) purged or unknown" in result.stdout
@@ -2,6 +2,7 @@ import time
 
 from typer.testing import CliRunner
 from artifactdb.cli.main import app
+from artifactdb.cli.cliutils import get_contextual_client, clear_client_cache
 
 runner = CliRunner()
 
@@ -88,6 +89,11 @@ def test_adb_login_help():
     assert "Switch to authenticated access." in result.stdout
 
 
-
-
-
+def test_contextual_client_cached():
+    clear_client_cache()
+    client = get_contextual_client()
+    assert get_contextual_client() is client
+    # different client parameters, different client
+    assert get_contextual_client(cache_dir="/tmp") is not client
+    clear_client_cache()
+    assert get_contextual_client() is not client
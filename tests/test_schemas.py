@@ -119,6 +119,18 @@ def test_adb_schemas_validate_invalid():
     assert result.exit_code == 1
 
 
+def test_adb_schemas_validate_local_valid():
+    result = runner.invoke(app, ["schemas", "validate", "--local", "tests/files/test_metadata.json"])
+    assert result.exit_code == 0
+    assert "1 document(s) valid" in result.stdout
+
+
+def test_adb_schemas_validate_local_invalid():
+    result = runner.invoke(app, ["schemas", "validate", "--local", "tests/files/test_metadata_invalid.json"])
+    assert result.exit_code == 1
+    assert "1 invalid document(s)" in result.stdout
+
+
 def test_adb_schemas_clients():
     result = runner.invoke(app, ["schemas", "clients"])
     assert result.exit_code == 0
@@ -126,4 +138,13 @@ def test_adb_schemas_clients():
     assert "base_uri:" in result.stdout
     assert "cache_ttl: 43200" in result.stdout
     assert "client: artifactdb.db.schema.SchemaClientGitlab" in result.stdout
-    assert "folder: resolved" in result.stdout
\ No newline at end of file
+    assert "folder: resolved" in result.stdout
+
+def test_adb_schemas_fetch_with_refs():
+    # schemas referenced with $ref are fetched too, relatively to the referencing one
+    from artifactdb.cli.commands.schemas import fetch_schemas, get_schema_refs
+
+    schemas = fetch_schemas(["basic_list/v2.json"])
+    assert "basic_list/v2.json" in schemas
+    for uri, schema in schemas.items():
+        assert get_schema_refs(uri, schema).issubset(schemas)
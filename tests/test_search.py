@@ -1,3 +1,4 @@
+import json
 import time
 
 from typer.testing import CliRunner
@@ -12,7 +13,8 @@ def test_adb_search_help():
     result = runner.invoke(app, ["search", "--help"])
     assert result.exit_code == 0
     assert "Searching metadata documents, using active context." in result.stdout
-    options = ["--fields", "--project-id", "--version", "--latest", "--no-latest", "--size", "--format", "--save",
+    options = ["--fields", "--project-id", "--version", "--latest", "--no-latest", "--size", "--all", "--limit", "--format", "--batch-size", "--cache",
+               "--cache-ttl", "--refresh", "--offline", "--save",
                "--load", "--delete", "--ls", "--no-ls", "--show", "--verbose", "--no-verbose", "--help"]
     for option in options:
         assert option in result.stdout
@@ -41,6 +43,71 @@ def test_adb_search_es_query(upload_new_project):
     assert "path: test_file3.txt" in result.stdout
 
 
+def test_adb_search_ndjson(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(
+        app, ["search", "--format", "ndjson", "--size", "1", f"_extra.project_id:{project_id}"]
+    )
+    assert result.exit_code == 0
+    # not paginated, one document per line
+    docs = [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    assert len(docs) == 3
+    assert {doc["path"] for doc in docs} == {"test_file1.txt", "test_file2.txt", "test_file3.txt"}
+
+
+def test_adb_search_all(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    # no prompt between pages
+    result = runner.invoke(app, ["search", "--all", "--size", "1", f"_extra.project_id:{project_id}"])
+    assert result.exit_code == 0
+    assert "More" not in result.stdout
+    assert "path: test_file3.txt" in result.stdout
+    assert "No more results" in result.stdout
+
+
+def test_adb_search_limit(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(app, ["search", "--limit", "2", f"_extra.project_id:{project_id}"])
+    assert result.exit_code == 0
+    assert result.stdout.count("path: test_file") == 2
+    assert "Limit of 2 results reached" in result.stdout
+
+
+def test_adb_search_csv(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(
+        app,
+        [
+            "search", "--format", "csv", "--batch-size", "2", "--fields", "path,_extra.project_id",
+            f"_extra.project_id:{project_id}",
+        ],
+    )
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert lines[0] == "path,_extra.project_id"
+    assert f"test_file1.txt,{project_id}" in lines
+
+
+def test_adb_search_cache(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    args = ["search", "--all", "--cache", "--verbose", f"_extra.project_id:{project_id}"]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "from local cache" not in result.stdout
+    # same query, extra whitespaces are ignored
+    args[-1] = f"  _extra.project_id:{project_id} "
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "Results from local cache" in result.stdout
+    assert "path: test_file1.txt" in result.stdout
+    result = runner.invoke(app, args + ["--refresh"])
+    assert result.exit_code == 0
+    assert "from local cache" not in result.stdout
+    result = runner.invoke(app, args + ["--cache-ttl", "0"])
+    assert result.exit_code == 0
+    assert "from local cache" not in result.stdout
+
+
 def test_adb_search_es_query_no_results():
     result = runner.invoke(app, ["search", "_extra.project_id:testOLA-231321312"])
     assert result.exit_code == 0
@@ -190,3 +257,57 @@ def test_adb_search_option_show_invalid():
     assert result.exit_code == 0
     assert "No such profile named 'invalidProfile'" in result.stdout
 
+
+
+def test_adb_search_arrow_mixed_types(capsysbinary):
+    pyarrow = pytest.importorskip("pyarrow")
+    import io
+    import pyarrow.ipc
+    from artifactdb.cli.formatters.tabular import ArrowFormatter
+
+    fmt = ArrowFormatter()
+    fmt.batch_size = 2
+    # "size" is null in the first batch (string column), "count" holds ints then
+    # a float without fractional part, "ratio" mixes ints and floats
+    docs = [
+        {"path": "a", "size": None, "count": 1, "ratio": 1},
+        {"path": "b", "size": None, "count": 2, "ratio": 0.5},
+        {"path": "c", "size": 3, "count": 3.0, "ratio": 2},
+    ]
+    for doc in docs:
+        fmt.format_result(doc, None)
+    fmt.close(None)
+    table = pyarrow.ipc.open_file(io.BytesIO(capsysbinary.readouterr().out)).read_all()
+    assert table.column("size").to_pylist() == [None, None, "3"]
+    assert table.column("count").to_pylist() == [1, 2, 3]
+    assert table.column("ratio").to_pylist() == [1.0, 0.5, 2.0]
+
+
+def test_adb_search_arrow_type_mismatch(capsysbinary):
+    pytest.importorskip("pyarrow")
+    from artifactdb.cli.cliutils import InvalidArgument
+    from artifactdb.cli.formatters.tabular import ArrowFormatter
+
+    fmt = ArrowFormatter()
+    fmt.batch_size = 2
+    # "count" is an integer column according to the first batch, 2.5 can't be
+    # written without loss, it's an error instead of a null value
+    docs = [{"count": 1}, {"count": 2}, {"count": 2.5}]
+    with pytest.raises(InvalidArgument, match="can't hold value 2.5"):
+        for doc in docs:
+            fmt.format_result(doc, None)
+        fmt.close(None)
+
+
+def test_adb_search_csv_fields_found_later(capsys):
+    from artifactdb.cli.formatters.tabular import CsvFormatter
+
+    fmt = CsvFormatter()
+    fmt.batch_size = 1
+    # columns come from the first batch, fields found later on are reported
+    for doc in [{"a": 1}, {"a": 2, "b": {"c": 3}}]:
+        fmt.format_result(doc, None)
+    fmt.close(None)
+    out, err = capsys.readouterr()
+    assert out == "a\n1\n2\n"
+    assert "ignored: b.c" in err
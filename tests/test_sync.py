@@ -0,0 +1,45 @@
+import os
+
+from typer.testing import CliRunner
+from artifactdb.cli.main import app
+
+runner = CliRunner()
+
+
+def test_adb_sync_no_args():
+    result = runner.invoke(app, "sync")
+    assert result.exit_code == 2
+    assert "Missing argument 'WHAT'." in result.stdout
+
+
+def test_adb_sync_option_help():
+    result = runner.invoke(app, ["sync", "--help"])
+    assert result.exit_code == 0
+    for argument in ["WHAT", "DEST"]:
+        assert argument in result.stdout
+    options = ["--delete", "--dry-run", "--jobs", "--retries", "--chunk-size", "--verbose", "--help"]
+    for option in options:
+        assert option in result.stdout
+
+
+def test_adb_sync_project(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    project_version = upload_new_project["project_version"]
+    dest = f"{os.environ['HOME']}/sync_cli/{project_id}"
+    result = runner.invoke(app, ["sync", "--dry-run", f"{project_id}@{project_version}", dest])
+    assert result.exit_code == 0
+    assert "Dry run, 3 artifact(s) to download" in result.stdout
+    assert not os.path.exists(f"{dest}/test_file1.txt")
+    result = runner.invoke(app, ["sync", f"{project_id}@{project_version}", dest])
+    assert result.exit_code == 0
+    assert os.path.exists(f"{dest}/test_file1.txt")
+    # second run, nothing left to download
+    result = runner.invoke(app, ["sync", f"{project_id}@{project_version}", dest])
+    assert result.exit_code == 0
+    assert "0 artifact(s) to download (0 B), 0 to delete, 3 up-to-date" in result.stdout
+
+
+def test_adb_sync_one_artifact_invalid():
+    result = runner.invoke(app, ["sync", "test-OLA000000566:file.txt@1", "/tmp/sync_cli"])
+    assert result.exit_code == 1
+    assert "Only projects can be synced" in str(result.exception)
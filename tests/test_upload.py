@@ -33,6 +33,17 @@ def test_adb_upload_option_help():
         "--upload-mode",
         "--expires-in",
         "--validate",
+        "--local-validation",
+        "--jobs",
+        "--part-size",
+        "--part-concurrency",
+        "--resumable",
+        "--resume",
+        "--abort",
+        "--skip-unchanged",
+        "--diff",
+        "--batch",
+        "--batch-jobs",
         "--verbose",
         "--confirm",
         "--help",
@@ -54,6 +65,138 @@ def test_adb_upload_new_project():
     assert "Upload completed." in result.stdout
 
 
+def test_adb_upload_throughput_summary():
+    result = runner.invoke(app, ["upload", "--jobs", "4", path])
+    assert result.exit_code == 0
+    assert "Uploaded 3 files" in result.stdout
+
+
+def test_adb_upload_missing_staging_dir():
+    result = runner.invoke(app, ["upload", "/tmp/no-such-staging-dir"])
+    assert result.exit_code == 1
+    assert "doesn't exist" in result.stdout
+
+
+def test_adb_upload_jobs_presigned(monkeypatch):
+    # with presigned URLs, --jobs reaches the CLI's own transfer threads pool
+    from artifactdb.cli.commands import upload
+
+    pipeline = upload.run_upload_pipeline
+    used_jobs = []
+
+    def run_upload_pipeline(staging_path, files, to_send, urls, jobs, on_sent):
+        used_jobs.append(jobs)
+        return pipeline(staging_path, files, to_send, urls, jobs, on_sent)
+
+    monkeypatch.setattr(upload, "run_upload_pipeline", run_upload_pipeline)
+    result = runner.invoke(app, ["upload", "--jobs", "2", path])
+    assert result.exit_code == 0
+    assert used_jobs == [2]
+
+
+def test_adb_upload_transfer_kwargs():
+    # transfer options are passed to the client's upload_project(), or rejected if
+    # it doesn't declare them, instead of being silently ignored
+    from typer import BadParameter
+    from artifactdb.cli.commands.upload import get_transfer_kwargs
+
+    class Client:
+        def upload_project(self, staging_dir, max_workers=None, **kwargs):
+            pass
+
+    assert get_transfer_kwargs(Client(), max_workers=8, max_concurrency=None) == {
+        "max_workers": 8
+    }
+    with pytest.raises(BadParameter, match="max_concurrency"):
+        get_transfer_kwargs(Client(), max_concurrency=4)
+
+
+def test_adb_upload_part_size_requires_sts():
+    result = runner.invoke(app, ["upload", "--part-size", "64", path])
+    assert result.exit_code == 1
+    assert "require a `sts:*` upload mode" in str(result.exception)
+
+
+def test_adb_upload_resumable():
+    result = runner.invoke(app, ["upload", "--resumable", path])
+    assert result.exit_code == 0
+    assert "Upload completed." in result.stdout
+
+
+def test_adb_upload_resume_nothing_to_resume():
+    result = runner.invoke(app, ["upload", "--resume", path])
+    assert result.exit_code == 1
+    assert "No interrupted upload to resume" in str(result.exception)
+
+
+def test_adb_upload_presigned_url_expiry():
+    from artifactdb.cli.commands.upload import get_presigned_url_expiry
+
+    url = "https://bucket/key?X-Amz-Date=20240101T000000Z&X-Amz-Expires=3600&X-Amz-Signature=x"
+    assert get_presigned_url_expiry(url) == 1704067200 + 3600
+    assert get_presigned_url_expiry("https://bucket/key?Expires=1704067200") == 1704067200
+    assert get_presigned_url_expiry("https://bucket/key") is None
+
+
+def test_adb_upload_resumable_requires_presigned():
+    result = runner.invoke(app, ["upload", "--resumable", "--upload-mode", "sts:boto3", path])
+    assert result.exit_code == 1
+    assert "Resumable uploads require `presigned` upload mode" in str(result.exception)
+
+
+def test_adb_upload_skip_unchanged(upload_new_project):
+    project_id = upload_new_project["project_id"]
+    result = runner.invoke(app, ["upload", "--project-id", project_id, "--skip-unchanged", path])
+    assert result.exit_code == 0
+    assert "3 files" in result.stdout
+    assert "unchanged since version" in result.stdout
+    assert "Upload completed." in result.stdout
+
+
+def test_adb_upload_diff_requires_project_id():
+    result = runner.invoke(app, ["upload", "--diff", path])
+    assert result.exit_code == 1
+    assert "require --project-id" in str(result.exception)
+
+
+def test_adb_upload_batch(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"staging_dir,read_access\n{path},public\n{path},viewers\n")
+    result = runner.invoke(app, ["upload", "--batch", str(manifest)])
+    assert result.exit_code == 0
+    assert "Uploaded 2/2 staging folders" in result.stdout
+
+
+def test_adb_upload_batch_invalid_metadata(tmp_path, monkeypatch):
+    # metadata files of all staging folders are validated before any transfer
+    pytest.importorskip("jsonschema")
+    import json
+    from artifactdb.cli.commands import schemas
+
+    schema = {"$id": "test/v1.json", "properties": {"n": {"type": "integer"}}}
+    monkeypatch.setattr(
+        schemas, "fetch_schemas", lambda ids, client=None: {"test/v1.json": schema}
+    )
+    for name, value in (("valid", 1), ("invalid", "one")):
+        (tmp_path / name).mkdir()
+        doc = {"$schema": "test/v1.json", "n": value}
+        (tmp_path / name / "doc.json").write_text(json.dumps(doc))
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("staging_dir\nvalid\ninvalid\n")
+    result = runner.invoke(app, ["upload", "--batch", str(manifest)])
+    assert result.exit_code == 1
+    assert "1 invalid document(s)" in result.stdout
+    assert "staging folders" not in result.stdout
+
+
+def test_adb_upload_batch_with_staging_dir_should_fail(tmp_path):
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(f"- staging_dir: {path}\n")
+    result = runner.invoke(app, ["upload", "--batch", str(manifest), path])
+    assert result.exit_code == 1
+    assert "set in the manifest" in str(result.exception)
+
+
 def test_adb_upload_with_existing_project_id():
     result = runner.invoke(app, ["upload", "--project-id", "test-OLA000000001", path])
     assert result.exit_code == 0